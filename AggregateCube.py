@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+
+
+class AggregateCube(object):
+    """
+    Cumulative totals of transaction amounts, indexed by date and category.
+
+    The cube is built once from a set of transactions and then answers "how much, and how many transactions, in these
+    categories between these dates" with a few array lookups instead of scanning the transactions.  Transactions are
+    bucketed by their exact date, so for Mint data (dates without a time of day) the cube has one row per day that has
+    any transactions.
+    """
+
+    def __init__(self, dates, categories, amounts):
+        """
+        Initialize a cube from columns of transaction data
+
+        :param dates: Array-like of transaction dates
+        :param categories: Array-like of transaction categories.  Transactions without a category are not counted.
+        :param amounts: Array-like of transaction amounts.  Missing amounts are counted as 0.
+        """
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        codes, uniques = pd.factorize(pd.Series(categories, dtype=object))
+        amounts = np.nan_to_num(np.asarray(amounts, dtype='float64'))
+
+        valid = (codes >= 0) & ~np.isnat(dates)
+        self.dates, date_codes = np.unique(dates[valid], return_inverse=True)
+        self.categories = pd.Index(np.asarray(uniques, dtype=object))
+
+        shape = (len(self.dates), len(self.categories))
+        cells = date_codes * shape[1] + codes[valid]
+        self.totals = np.bincount(cells, weights=amounts[valid], minlength=shape[0] * shape[1]).reshape(shape)
+        self.counts = np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape)
+        self._cumulative = None
+
+    @classmethod
+    def from_df(cls, df):
+        """
+        Initialize a cube from a DataFrame of transactions (eg: Transactions.df)
+
+        :param df: DataFrame with Date, Category and Amount columns, or None for an empty cube
+        :return: AggregateCube instance
+        """
+        if df is None:
+            return cls([], [], [])
+        return cls(df['Date'], df['Category'], df['Amount'])
+
+    def add(self, dates, categories, amounts):
+        """
+        Add transactions to the cube, updating only the cells they fall in.
+
+        Dates and categories not yet in the cube are inserted.  If the running totals have already been computed, they
+        are updated from the earliest added date onward rather than recomputed, so adding recent transactions (eg: a
+        month-to-date refresh) costs time in proportion to the added transactions.
+
+        :param dates: Array-like of transaction dates
+        :param categories: Array-like of transaction categories.  Transactions without a category are not counted.
+        :param amounts: Array-like of transaction amounts.  Missing amounts are counted as 0.
+        :return: None
+        """
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        categories = pd.Series(categories, dtype=object)
+        amounts = np.nan_to_num(np.asarray(amounts, dtype='float64'))
+        valid = categories.notna().values & ~np.isnat(dates)
+        dates, categories, amounts = dates[valid], categories.values[valid], amounts[valid]
+        if len(dates) == 0:
+            return
+
+        new_categories = pd.Index(categories).unique().difference(self.categories, sort=False)
+        if len(new_categories) > 0:
+            self.categories = self.categories.append(pd.Index(np.asarray(new_categories, dtype=object)))
+            padding = ((0, 0), (0, len(new_categories)))
+            self.totals = np.pad(self.totals, padding)
+            self.counts = np.pad(self.counts, padding)
+            if self._cumulative is not None:
+                self._cumulative = tuple(np.pad(c, padding) for c in self._cumulative)
+
+        new_dates = np.setdiff1d(dates, self.dates)
+        if len(new_dates) > 0:
+            positions = np.searchsorted(self.dates, new_dates)
+            self.dates = np.insert(self.dates, positions, new_dates)
+            self.totals = np.insert(self.totals, positions, 0, axis=0)
+            self.counts = np.insert(self.counts, positions, 0, axis=0)
+            if self._cumulative is not None:
+                # A new empty date has the same running total as the date it is inserted before
+                self._cumulative = tuple(np.insert(c, positions + 1, c[positions], axis=0) for c in self._cumulative)
+
+        rows = np.searchsorted(self.dates, dates)
+        columns = self.categories.get_indexer(categories)
+        np.add.at(self.totals, (rows, columns), amounts)
+        np.add.at(self.counts, (rows, columns), 1)
+
+        if self._cumulative is not None:
+            first = rows.min()
+            delta_totals = np.zeros((len(self.dates) - first, len(self.categories)))
+            delta_counts = np.zeros(delta_totals.shape, dtype=np.int64)
+            np.add.at(delta_totals, (rows - first, columns), amounts)
+            np.add.at(delta_counts, (rows - first, columns), 1)
+            self._cumulative[0][first + 1:] += np.cumsum(delta_totals, axis=0)
+            self._cumulative[1][first + 1:] += np.cumsum(delta_counts, axis=0)
+
+    def add_df(self, df):
+        """
+        Add a DataFrame of transactions to the cube (see add)
+
+        :param df: DataFrame with Date, Category and Amount columns
+        :return: None
+        """
+        self.add(df['Date'], df['Category'], df['Amount'])
+
+    def cumulative(self):
+        """
+        Return the running totals and counts over dates, computing them if required.
+
+        Row i of each is the total of all dates before self.dates[i], so the total over dates[i:j] is row j - row i.
+
+        :return: Tuple of (cumulative totals, cumulative counts), each of shape (dates + 1, categories)
+        """
+        if self._cumulative is None:
+            zeros = np.zeros((1, len(self.categories)))
+            self._cumulative = (np.concatenate([zeros, np.cumsum(self.totals, axis=0)]),
+                                np.concatenate([zeros.astype(np.int64), np.cumsum(self.counts, axis=0)]))
+        return self._cumulative
+
+    def interval_totals(self, lowers, uppers, categories):
+        """
+        Total the transactions in each category over each of a series of date intervals.
+
+        :param lowers: Start dates of the intervals (inclusive)
+        :param uppers: End dates of the intervals (inclusive)
+        :param categories: Categories to total.  Categories not in the cube total 0.
+        :return: Tuple of (sums, counts), each an ndarray of shape (intervals, categories)
+        """
+        lowers = np.array([to_datetime64(d) for d in lowers], dtype='datetime64[ns]')
+        uppers = np.array([to_datetime64(d) for d in uppers], dtype='datetime64[ns]')
+        lo = np.searchsorted(self.dates, lowers, side='left')
+        hi = np.maximum(np.searchsorted(self.dates, uppers, side='right'), lo)
+
+        columns = self.categories.get_indexer(list(categories))
+        missing = columns < 0
+        columns[missing] = 0
+
+        cumulative_totals, cumulative_counts = self.cumulative()
+        if len(self.categories) == 0:
+            shape = (len(lo), len(columns))
+            return np.zeros(shape), np.zeros(shape, dtype=np.int64)
+        sums = cumulative_totals[hi][:, columns] - cumulative_totals[lo][:, columns]
+        counts = cumulative_counts[hi][:, columns] - cumulative_counts[lo][:, columns]
+        sums[:, missing] = 0.0
+        counts[:, missing] = 0
+        return sums, counts
+
+    def total(self, categories, start=None, stop=None):
+        """
+        Return the total of all transactions in any of categories between start and stop (inclusive)
+
+        :param categories: List of categories
+        :param start: (Optional) Start of date range.  If None, range starts at the earliest transaction
+        :param stop: (Optional) End of date range.  If None, range ends at the latest transaction
+        :return: Float
+        """
+        start, stop = self.bounds(start, stop)
+        return self.interval_totals([start], [stop], categories)[0].sum()
+
+    def daterange(self, categories, start=None, stop=None):
+        """
+        Return the dates of the first and last transactions in any of categories between start and stop (inclusive)
+
+        :param categories: List of categories
+        :param start: (Optional) Start of date range.  If None, range starts at the earliest transaction
+        :param stop: (Optional) End of date range.  If None, range ends at the latest transaction
+        :return: Tuple of (Timestamp, Timestamp), or None if there are no such transactions
+        """
+        start, stop = self.bounds(start, stop)
+        lo = np.searchsorted(self.dates, to_datetime64(start), side='left')
+        hi = np.searchsorted(self.dates, to_datetime64(stop), side='right')
+        columns = self.categories.get_indexer(list(categories))
+        columns = columns[columns >= 0]
+        has_transactions = np.flatnonzero(self.counts[lo:hi][:, columns].sum(axis=1))
+        if len(has_transactions) == 0:
+            return None
+        return pd.Timestamp(self.dates[lo + has_transactions[0]]), pd.Timestamp(self.dates[lo + has_transactions[-1]])
+
+    def bounds(self, start=None, stop=None):
+        """
+        Return (start, stop), replacing None with the widest date the datetime64[ns] type can hold
+
+        :return: Tuple of dates
+        """
+        if start is None:
+            start = pd.Timestamp.min
+        if stop is None:
+            stop = pd.Timestamp.max
+        return start, stop
+
+
+def to_datetime64(date):
+    """
+    Convert a date (datetime, Timestamp, string, etc.) to a numpy datetime64[ns]
+
+    :param date: Date to convert
+    :return: numpy.datetime64
+    """
+    return np.datetime64(pd.Timestamp(date).to_datetime64(), 'ns')
@@ -1,8 +1,14 @@
-from Transactions import Transactions, monthdelta, month_intervals
-import matplotlib.pyplot as plt
+from Transactions import Transactions, period_shift, period_end, period_intervals, window_sums
+from AggregateCube import to_datetime64
 import pandas as pd
 from pprint import pprint
 import numpy as np
+from collections import OrderedDict
+
+# Least recently used cache of tabulated budgets, keyed by the budget, arguments and Transactions.version (see
+# tabulation_cache_lookup)
+TABULATION_CACHE = OrderedDict()
+TABULATION_CACHE_SIZE = 128
 
 #FEATURE: Most functions take the same arguments (start, stop, moving average, trxs).  Should budget instances just be set for these?
 
@@ -68,36 +74,43 @@ class Budget(object):
         :return: Figure and axes objects
         """
         # FEATURE: Add inputs for Fig, ax, to be able to plot multiple things on the same figure/axes
-        fig, ax = plt.subplots()
+        series = self.tabulate_plot(trxs, moving_average=moving_average, start=start, stop=stop)
+        if savefig is True:
+            savefig = self.name
+        return draw_budget_plot(series, plot_budget=plot_budget, color=color, savefig=savefig)
+
+    def tabulate_plot(self, trxs, moving_average=None, start=None, stop=None):
+        """
+        Tabulate the data plotted by plot_budget, without plotting it.
+
+        The result only holds arrays and strings, so it can be drawn later or in another process (see draw_budget_plot).
 
-        # Plot monthly spending as bars
+        :param trxs: See plot_budget
+        :param moving_average: See plot_budget
+        :param start: See plot_budget
+        :param stop: See plot_budget
+        :return: Dict of the plotted series
+        """
+        # Monthly spending
         sum_monthly = self.tabulate_transactions(trxs, moving_average=None, start=start, stop=stop)
         date_range = sum_monthly.get_daterange()
-        date_range = (monthdelta(date_range[0], delta=-1, day=None), monthdelta(date_range[1], delta=1, day=None))
-
-        ax.bar(sum_monthly.df['Date'].values, sum_monthly.df['Amount'].values, width=10,
-               label=f'{self.name}', color=color)
+        date_range = (period_end(period_shift(date_range[0], -1)), period_end(period_shift(date_range[1], 1)))
 
-        # Plot budget, if requested
-        if plot_budget:
-            ax.plot(date_range, [self.amount] * 2, color=color, ls='-', label=f'{self.name} Budget (${self.amount})')
+        series = {
+            'name': self.name,
+            'amount': self.amount,
+            'date_range': date_range,
+            'dates': sum_monthly.df['Date'].values,
+            'amounts': sum_monthly.df['Amount'].values,
+            'moving_averages': [],
+        }
 
-        # Plot rolling average, if requested
+        # Rolling averages, if requested
         if moving_average is not None:
             for ma in moving_average:
                 moving = sum_monthly.moving_average(start=start, stop=stop, n=ma)
-                ax.plot(moving.df['Date'].values, moving.df['Amount'].values, color=color,
-                        label=f'{self.name} {ma}-month average', ls='--')
-
-        fig.autofmt_xdate(bottom=0.2, rotation=30, ha='right')
-
-        if savefig is not None:
-            if savefig is True:
-                savefig = self.name
-            ax.legend()
-            fig.savefig(savefig)
-
-        return fig, ax
+                series['moving_averages'].append((ma, moving.df['Date'].values, moving.df['Amount'].values))
+        return series
 
     def tabulate_transactions(self, trxs, moving_average=None, start=None, stop=None):
         """
@@ -119,14 +132,22 @@ class Budget(object):
                       end of the month by Transactions.slice_by_date).  If None, will stop with the most recent transaction
         :return: Transactions instance
         """
-        if moving_average is not None and start is not None:
-            data_start = monthdelta(start, -(moving_average - 1), 1)
-        else:
-            data_start = start
-        new_trxs = trxs.slice_by_date(start=data_start, stop=stop).slice_by_category(self.categories)
-        new_trxs = new_trxs.by_month(start=data_start, stop=stop, combine_as=self.name)
-        if moving_average is not None:
-            new_trxs = new_trxs.moving_average(start=start, stop=stop, n=moving_average)
+        key = ('transactions', trxs.version, self.name, tuple(self.categories), moving_average, start, stop)
+        tabulated = tabulation_cache_lookup(key)
+        if tabulated is None:
+            if moving_average is not None and start is not None:
+                data_start = period_shift(start, -(moving_average - 1))
+            else:
+                data_start = start
+            tabulated = trxs.query().slice_by_date(start=data_start, stop=stop).slice_by_category(self.categories)
+            tabulated = tabulated.by_month(start=data_start, stop=stop, combine_as=self.name)
+            if moving_average is not None:
+                tabulated = tabulated.moving_average(start=start, stop=stop, n=moving_average)
+            tabulation_cache_store(key, tabulated)
+
+        # Return a copy so callers cannot modify the cached result
+        new_trxs = Transactions()
+        new_trxs.df = tabulated.df.copy()
         return new_trxs
 
     def to_ds(self, trxs, moving_average=None, start=None, stop=None, return_relative=True):
@@ -142,28 +163,161 @@ class Budget(object):
         :return: Pandas Series
         """
         #FEATURE: Need test code
-        by_month = {}
-        by_month_amounts = {}
         if moving_average is None:
             moving_average = [1]
 
-        for ma in moving_average:
-            by_month[ma] = self.tabulate_transactions(trxs, moving_average=ma, start=start, stop=stop)
-            by_month_amounts[ma] = by_month[ma].get_amounts()
-            if return_relative:
-                for i in range(len(by_month_amounts[ma])):
-                    by_month_amounts[ma][i] -= self.amount
+        # Default to the range of this budget's transactions
+        if start is None or stop is None:
+            lower = None if start is None else period_shift(start, -(max(moving_average) - 1))
+            daterange = trxs.cube().daterange(self.categories, lower, stop)
+            if daterange is None:
+                if start is None and stop is None:
+                    raise ValueError(f"No transactions in budget '{self.name}' to define the date range")
+                # No transactions to extend the range with, so it is the single month given
+                daterange = (stop, start)
+            if start is None:
+                start = daterange[0]
+            if stop is None:
+                # The range includes start even if the last transaction is before it
+                stop = max(daterange[1], start)
 
-        a_key = list(by_month.keys())[0]
-        dates = by_month[a_key].get_dates()
+        # Tabulate the monthly series once and take every moving average from it
+        dates, amounts = tabulate_budgets([self], trxs, moving_average, start, stop)
+        amounts = amounts[0]
+        if return_relative:
+            amounts = amounts - self.amount
 
         columns = pd.MultiIndex.from_product([dates, moving_average])
+        ds = pd.Series(amounts.ravel(), index=columns, name=self.name + f" ({str(self.amount)})")
+        return ds
 
-        data = []
-        for i in range(len(by_month[a_key])):
-            for ma in moving_average:
-                data.append(by_month_amounts[ma][i])
-        data = np.array(data)
 
-        ds = pd.Series(data, index=columns, name=self.name + f" ({str(self.amount)})")
-        return ds
+def tabulate_budgets(budgets, trxs, moving_average, start, stop, category_budgets=None):
+    """
+    Total the transactions of several budgets by month and compute every requested moving average from those totals.
+
+    Every category of every budget is totalled by month in a single lookup of trxs's aggregate cube (see
+    Transactions.cube), and each budget's monthly series is the sum of its categories' series through a category to
+    budget lookup table.  Each n-month moving average is then taken from those monthly series, so the data is
+    aggregated once regardless of the number of budgets or moving averages.
+
+    For each budget and moving average, results match Budget.tabulate_transactions with the same start and stop.
+    Results are cached in TABULATION_CACHE by trxs.version, so repeated calls do not recompute them.
+
+    :param budgets: List of Budget instances
+    :param trxs: Transactions instance
+    :param moving_average: List of integer numbers of months over which to apply moving averages
+    :param start: Date in the first month to return
+    :param stop: Date in the last month to return
+    :param category_budgets: (Optional) Dict of each category to a list of the positions in budgets of the budgets
+                             that include it (eg: Budgets.category_budgets).  If None, it is built from budgets
+    :return: Tuple of (dates, amounts), where dates is a DatetimeIndex of the end of each month and amounts is an
+             ndarray of shape (budgets, dates, moving averages)
+    """
+    key = ('budgets', trxs.version, tuple(tuple(b.categories) for b in budgets), tuple(moving_average), start, stop)
+    tabulated = tabulation_cache_lookup(key)
+    if tabulated is not None:
+        return tabulated[0], tabulated[1].copy()
+
+    # Lookup table of the budgets that include each category
+    if category_budgets is None:
+        category_budgets = {}
+        for i, b in enumerate(budgets):
+            for cat in b.categories:
+                category_budgets.setdefault(cat, []).append(i)
+    categories = list(category_budgets)
+    membership = np.zeros((len(categories), len(budgets)))
+    for row, cat in enumerate(categories):
+        membership[row, category_budgets[cat]] = 1.0
+
+    # Total each month, starting early enough for the longest moving average to be complete at start
+    n_before = max(moving_average) - 1
+    lowers, uppers = period_intervals(period_shift(start, -n_before), stop)
+    sums, _ = trxs.interval_totals(lowers, np.minimum(uppers, to_datetime64(stop)), categories)
+    monthly = sums @ membership
+
+    amounts = np.stack([window_sums(monthly[n_before - (ma - 1):], ma) / float(ma) for ma in moving_average], axis=-1)
+    dates = pd.DatetimeIndex(uppers[n_before:].astype(trxs.df['Date'].dtype))
+    amounts = amounts.transpose(1, 0, 2)
+    tabulation_cache_store(key, (dates, amounts))
+    return dates, amounts.copy()
+
+def tabulation_cache_lookup(key):
+    """
+    Return the result cached in TABULATION_CACHE for key, marking it as recently used, or None if it is not cached
+
+    Keys include a Transactions.version, so results computed from data that has since changed are never returned.
+
+    :param key: Hashable key
+    :return: Cached result or None
+    """
+    if key not in TABULATION_CACHE:
+        return None
+    TABULATION_CACHE.move_to_end(key)
+    return TABULATION_CACHE[key]
+
+def tabulation_cache_store(key, result):
+    """
+    Store a result in TABULATION_CACHE, evicting the least recently used results beyond TABULATION_CACHE_SIZE
+
+    :param key: Hashable key
+    :param result: Result to cache.  It must not be modified after it is stored
+    :return: None
+    """
+    TABULATION_CACHE[key] = result
+    TABULATION_CACHE.move_to_end(key)
+    while len(TABULATION_CACHE) > TABULATION_CACHE_SIZE:
+        TABULATION_CACHE.popitem(last=False)
+
+
+def draw_budget_plot(series, plot_budget=True, color=None, savefig=None):
+    """
+    Plot a budget's series from Budget.tabulate_plot (see Budget.plot_budget)
+
+    :param series: Dict returned by Budget.tabulate_plot
+    :param plot_budget: If True, plot the budget amount
+    :param color: Optional color of the bars and lines to be plotted
+    :param savefig: (Optional) File name to save the figure to
+    :return: Figure and axes objects
+    """
+    # Imported here so that only plotting loads matplotlib
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+
+    # Plot monthly spending as bars
+    name = series['name']
+    ax.bar(series['dates'], series['amounts'], width=10, label=f'{name}', color=color)
+
+    # Plot budget, if requested
+    if plot_budget:
+        ax.plot(series['date_range'], [series['amount']] * 2, color=color, ls='-',
+                label=f"{name} Budget (${series['amount']})")
+
+    # Plot rolling average, if requested
+    for ma, dates, amounts in series['moving_averages']:
+        ax.plot(dates, amounts, color=color, label=f'{name} {ma}-month average', ls='--')
+
+    fig.autofmt_xdate(bottom=0.2, rotation=30, ha='right')
+
+    if savefig is not None:
+        ax.legend()
+        fig.savefig(savefig)
+
+    return fig, ax
+
+def save_budget_plot(series, savefig, backend=None):
+    """
+    Plot a budget's series from Budget.tabulate_plot, save it to savefig and close the figure
+
+    :param series: Dict returned by Budget.tabulate_plot
+    :param savefig: File name to save the figure to
+    :param backend: (Optional) Matplotlib backend to switch to before plotting (eg: 'Agg' in worker processes)
+    :return: None
+    """
+    import matplotlib.pyplot as plt
+
+    if backend is not None:
+        plt.switch_backend(backend)
+    fig, ax = draw_budget_plot(series, savefig=savefig)
+    plt.close(fig)
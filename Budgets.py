@@ -1,11 +1,11 @@
-from Budget import Budget
+from Budget import Budget, tabulate_budgets, save_budget_plot
 import os
 import datetime
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from itertools import product
-from Transactions import monthdelta
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from Transactions import period_shift
 
 #FEATURE: Should I instantiate Budgets with a transactions object, date range, etc?  That removes most inputs from functions.  But its outside scope, too...  Could be optionally defined in self.trxs, but only used if input argument is not given during invocation (or could have two separate methods of invokation...)
 
@@ -20,6 +20,8 @@ class Budgets(object):
         """
         self.budgets = []
         self.name = name
+        # Lookup table of the positions in self.budgets of the budgets that include each category
+        self.category_budgets = {}
 
     def add_budget(self, b, ignore_duplicates=False):
         """
@@ -28,23 +30,27 @@ class Budgets(object):
         :param b: A Budget instance
         :return: None
         """
-        cat_list = self.get_categories(remove_duplicates=True)
         if ignore_duplicates is False:
             for cat in b.categories:
-                if cat in cat_list:
-                    raise ValueError("Tried to add duplicate category '{cat}'")
+                if cat in self.category_budgets:
+                    raise ValueError(f"Tried to add duplicate category '{cat}'")
+        i = len(self.budgets)
         self.budgets.append(b)
+        for cat in b.categories:
+            positions = self.category_budgets.setdefault(cat, [])
+            if not positions or positions[-1] != i:
+                positions.append(i)
 
     def get_categories(self, remove_duplicates=False):
         """
         Return a list of categories covered by the Budget items in this Budgets
         :return: List
         """
+        if remove_duplicates:
+            return list(self.category_budgets)
         cat_list = []
         for b in self.get_budgets():
             cat_list.extend(b.categories)
-        if remove_duplicates:
-            cat_list = list(set(cat_list))
         return cat_list
 
     def get_budgets(self):
@@ -103,10 +109,15 @@ class Budgets(object):
         """
         print(self.to_str(amount=amount, categories=categories))
 
-    def plot(self, trxs, moving_average=None, start=None, stop=None, saveloc='./', prefix='', normalize_dates=True):
+    def plot(self, trxs, moving_average=None, start=None, stop=None, saveloc='./', prefix='', normalize_dates=True,
+             workers=1):
         """
         Save PNGs for each Budget to saveloc.
 
+        The series for every budget are tabulated first (see Budget.tabulate_plot), then each is drawn, saved and closed
+        so memory does not grow with the number of budgets.  With several workers, the PNGs are drawn in a process pool
+        using the non-interactive Agg backend.
+
         :param trxs: Transactions object to be interpreted using this budget
         :param moving_average: (Optional) List of integers representing the number of months over which to calculate a
                                moving average to be added to the figure.  If None, no moving average is plotted.
@@ -119,6 +130,8 @@ class Budgets(object):
         :param normalize_dates: If True, find the min and max date of the data and make all plots over
                                 that date range
                                 Note: Specifying start and/or stop will override any value set by normalize_dates
+        :param workers: (Optional) Number of processes to draw with.  If None, uses the number of CPUs.  If 1, plots are
+                        drawn serially in this process.
         :return: None
         """
         if normalize_dates:
@@ -134,9 +147,21 @@ class Budgets(object):
         if not os.path.exists(saveloc):
             os.makedirs(saveloc)
 
+        series = []
+        savefigs = []
         for b in self.get_budgets():
-            savefig = saveloc + prefix + b.name
-            b.plot_budget(trxs, moving_average=moving_average, start=start, stop=stop, savefig=savefig)
+            series.append(b.tabulate_plot(trxs, moving_average=moving_average, start=start, stop=stop))
+            savefigs.append(saveloc + prefix + b.name)
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(series))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(partial(save_budget_plot, backend='Agg'), series, savefigs))
+        else:
+            for s, savefig in zip(series, savefigs):
+                save_budget_plot(s, savefig)
 
     def get_transactions_in_budgets(self, trxs, return_anti_match=False):
         """
@@ -146,11 +171,7 @@ class Budgets(object):
         :param return_anti_match: If True, match everything that IS NOT covered by this Budgets
         :return: Transactions instance with all applicable transactions
         """
-        categories = set()
-        for b in self.get_budgets():
-            for cat in b.categories:
-                categories.add(cat)
-        categories = list(categories)
+        categories = list(self.category_budgets)
 
         return trxs.slice_by_category(categories, return_anti_match=return_anti_match)
 
@@ -167,7 +188,8 @@ class Budgets(object):
         """
         Returns a DataFrame containing one or more moving average value for each month for all budgets in this instance
 
-        Results are arranged using a multi-index of date and moving average
+        Results are arranged using a multi-index of date and moving average.  All budgets and moving averages are
+        computed together from one monthly aggregation of trxs (see Budget.tabulate_budgets).
 
         :param trxs: Transactions instance
         :param moving_average: List of one or more moving averages to include.  If None, will use [1] by default
@@ -179,7 +201,6 @@ class Budgets(object):
 
         :return: Dataframe
         """
-        #TODO: This returns NaN for some fields, I think because the dates in each budget are not the full date range.  Need to address this.
         if moving_average is None:
             moving_average = [1]
 
@@ -190,14 +211,22 @@ class Budgets(object):
             if stop is None:
                 stop = daterange[1]
 
-        dss = []
-        for b in self.get_budgets():
-            dss.append(b.to_ds(trxs, moving_average=moving_average, start=start, stop=stop, return_relative=return_relative))
-        df = pd.DataFrame(dss)
+        # Every budget shares one index of all months in the range (months without spending are 0), so the frame is
+        # built directly from a dense array without aligning each budget's dates
+        budgets = self.get_budgets()
+        dates, amounts = tabulate_budgets(budgets, trxs, moving_average, start, stop,
+                                          category_budgets=self.category_budgets)
+        data = amounts.reshape(len(budgets), len(dates) * len(moving_average))
+        if return_relative:
+            data = data - np.array([b.amount for b in budgets], dtype=float)[:, np.newaxis]
+
+        columns = pd.MultiIndex.from_product([dates, moving_average])
+        index = [b.name + f" ({str(b.amount)})" for b in budgets]
+        df = pd.DataFrame(data, index=index, columns=columns)
         return df
 
     def heatmap_table(self, trxs, moving_average=None, start=None, stop=None, saveloc='./budget', return_relative=True,
-                      vmin=-50, vmax=50):
+                      vmin=-50, vmax=50, df=None, relative_scale=False, months_per_page=None):
         """
         Saves a Seaborn Heatmap formatted table of the Budgets to a file.
 
@@ -216,33 +245,39 @@ class Budgets(object):
         :param return_relative: Optionally return values relative to their budget amount (eg: budget.amount=-5 and total
                                 is -11, returned is -6)
         :param vmin, vmax: Min (max) value for the color range
+        :param df: (Optional) Precomputed DataFrame from to_df for this object.  If given, trxs, moving_average, start,
+                   stop and return_relative are not used
+        :param relative_scale: If True, color each row by its values as a percentage of its budget's amount (see
+                               percent_of_budget) while still annotating the dollar values.  vmin and vmax are then
+                               percentages
+        :param months_per_page: (Optional) Maximum number of months in each saved figure.  Longer ranges are split over
+                                several files, numbered saveloc_1, saveloc_2, etc.  If None, all months are saved in one
 
         :return: None
         """
-        # FEATURE: From Heather: Coloring might be better if each row was on a relative color scale (by % of budget?)
-        # rather than absolute.  Maybe I could do that by plotting a heatmap of the relative scale, then overlaying text from the absolute scale?
-        if start is None:
-            start = monthdelta(trxs.get_daterange()[0], +(max(moving_average)-1), 1)
-
-        df = self.to_df(trxs, moving_average=moving_average, start=start, stop=stop, return_relative=return_relative)
-        months = len(df.columns)
-        width = 6 + months
-        height = 4 + months / 1.25
-        fig, ax = plt.subplots(figsize=(width, height))
+        if df is None:
+            if moving_average is None:
+                moving_average = [1]
+            if start is None:
+                start = period_shift(trxs.get_daterange()[0], max(moving_average) - 1)
+            df = self.to_df(trxs, moving_average=moving_average, start=start, stop=stop,
+                            return_relative=return_relative)
 
-        # Create readable x-tick labels in format "Mon-YYYY | MovingAverage"
-        dates = [f"{date[0].strftime('%b-%Y')}" for date in list(df.columns)]
-        xticklabels = [" | ".join((x[0], str(x[1]))) for x in product(dates, moving_average)]
+        colors = self.percent_of_budget(df) if relative_scale else df.values
+        save_heatmap(df, colors, saveloc, vmin=vmin, vmax=vmax, months_per_page=months_per_page)
 
-        sns.heatmap(df, annot=True, ax=ax, fmt='.2f', vmin=vmin, vmax=vmax, center=0, cmap=sns.color_palette("RdYlGn"),
-                    xticklabels=xticklabels)
+    def percent_of_budget(self, df):
+        """
+        Return the values of a DataFrame from to_df for this object as percentages of each row's budget amount
+
+        Each row is divided by the magnitude of its budget's amount, so (with return_relative) -25 means 25% over budget.
+        Rows of budgets with an amount of 0 are returned as 0.
 
-        # Enlarge tick size (need a better way of setting this size?
-        for tick in ax.xaxis.get_major_ticks():
-            tick.label.set_fontsize(14)
-        for tick in ax.yaxis.get_major_ticks():
-            tick.label.set_fontsize(14)
-        fig.savefig(saveloc)
+        :param df: DataFrame returned by to_df
+        :return: ndarray of the same shape as df
+        """
+        amounts = np.abs(np.array([b.amount for b in self.get_budgets()], dtype=float))[:, np.newaxis]
+        return np.divide(df.values * 100.0, amounts, out=np.zeros(df.shape), where=amounts != 0)
 
     def to_budget(self, name=None, amount_type="Monthly"):
         """
@@ -263,3 +298,41 @@ class Budgets(object):
             # print(f"New summation: {amount} for categories {categories}")
         return Budget(amount, categories, name=name, amount_type=amount_type)
 
+
+def save_heatmap(df, colors, saveloc, vmin=-50, vmax=50, months_per_page=None):
+    """
+    Save a Seaborn Heatmap of a DataFrame from Budgets.to_df, optionally split into pages of at most months_per_page
+
+    :param df: DataFrame returned by Budgets.to_df, used for the annotations and labels
+    :param colors: ndarray of the same shape as df of the values to color cells by
+    :param saveloc: Relative file path and name to save location
+    :param vmin, vmax: Min (max) value for the color range
+    :param months_per_page: (Optional) Maximum number of months in each saved figure (see Budgets.heatmap_table)
+    :return: None
+    """
+    # Imported here so that only plotting loads matplotlib and seaborn
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Create readable x-tick labels in format "Mon-YYYY | MovingAverage"
+    xticklabels = [f"{date.strftime('%b-%Y')} | {ma}" for date, ma in df.columns]
+    columns_per_month = len(df.columns) // max(1, df.columns.get_level_values(0).nunique())
+    if months_per_page is None:
+        page_size = max(1, len(df.columns))
+    else:
+        page_size = months_per_page * columns_per_month
+    pages = range(0, len(df.columns), page_size)
+
+    for i, first in enumerate(pages):
+        page = slice(first, first + page_size)
+        columns = len(df.columns[page])
+        width = 6 + columns
+        height = 4 + columns / 1.25
+        fig, ax = plt.subplots(figsize=(width, height))
+
+        sns.heatmap(colors[:, page], annot=df.values[:, page], ax=ax, fmt='.2f', vmin=vmin, vmax=vmax, center=0,
+                    cmap=sns.color_palette("RdYlGn"), xticklabels=xticklabels[page], yticklabels=list(df.index))
+        ax.tick_params(labelsize=14)
+
+        fig.savefig(saveloc if len(pages) == 1 else f"{saveloc}_{i + 1}")
+        plt.close(fig)
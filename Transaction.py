@@ -2,8 +2,6 @@ import datetime
 import random
 import string
 import pandas as pd
-import numpy as np
-from collections import OrderedDict
 
 
 class Transaction(object):
@@ -11,27 +9,20 @@ class Transaction(object):
     Class to store a single transaction record.
     """
     MINT_CSV_DATE_FORMAT = "%m/%d/%Y"
-    DEFAULT_DATA = np.array(
-        [
-            ("Date", 'datetime64'),
-            ("Description", 'object'),
-            ("Description Original", 'object'),
-            ("Amount", 'float64'),
-            ("Transaction Type", 'object'),
-            ("Category", 'object'),
-            ("Account", 'object'),
-            ("Labels", 'object'),
-            ("Notes", 'object'),
-        ]
-    )
+    # Names of the fields of a Transaction, in their default csv order
+    FIELDS = ["date", "description", "description_original", "amount", "transaction_type", "category", "account",
+              "labels", "notes"]
+
+    # Fields are stored in slots rather than a per-instance dict to keep each record small.  date and amount are parsed
+    # by their setters and stored in _date and _amount.
+    __slots__ = tuple(f"_{field}" if field in ("date", "amount") else field for field in FIELDS)
 
     def __init__(self):
         """
         Initialize an empty Transaction instance.
         """
-        self.data = OrderedDict()
-        for row in self.DEFAULT_DATA:
-            self.data[row[0]] = [row[1], None]
+        for slot in self.__slots__:
+            setattr(self, slot, None)
 
     def __str__(self):
         signed_amount = self.amount
@@ -48,11 +39,9 @@ class Transaction(object):
         :param other: Another object (must be Transaction-like to be equal)
         :return: Boolean of whether the objects are equal
         """
-        comparible_attributes = ["Date", "Description", "Description Original", "Amount", "Transaction Type",
-                                 "Category", "Account", "Labels", "Notes"]
         equal = True
-        for attr in comparible_attributes:
-            if getattr(self, attr) == getattr(other, attr):
+        for attr in self.fields:
+            if getattr(self, attr) == getattr(other, attr, None):
                 continue
             else:
                 equal = False
@@ -128,17 +117,19 @@ class Transaction(object):
         trx_as_list = [None] * len(fields)
         for i, field in enumerate(fields):
             trx_as_list[i] = getattr(self, field)
-            if field == 'Date':
+            if field == 'date':
                 trx_as_list[i] = trx_as_list[i].strftime(Transaction.MINT_CSV_DATE_FORMAT)
-            if field == 'Amount':
+            if field == 'amount':
                 trx_as_list[i] = str(trx_as_list[i])
+            if trx_as_list[i] is None:
+                trx_as_list[i] = ''
 
         return separator.join(trx_as_list)
 
     @classmethod
     def from_dict(cls, data_dict, fill_blanks=False):
         """
-        Return a Transaction initialized from a dict containing data for all fields in Transaction.DEFAULT_DATA_MAP
+        Return a Transaction initialized from a dict containing data for all fields in Transaction.FIELDS
 
         :param data_dict:
         :param fill_blanks: If True, fill all blank fields with None except date and amount, which is always required
@@ -190,7 +181,7 @@ class Transaction(object):
 
         :return: Datetime instance
         """
-        return self.data['Date'][1]
+        return self._date
 
     @date.setter
     def date(self, value):
@@ -203,7 +194,7 @@ class Transaction(object):
         if not isinstance(value, datetime.datetime):
             value = datetime.datetime.strptime(value, Transaction.MINT_CSV_DATE_FORMAT)
         # If we get here, we have a datetime.datetime object
-        self.data['Date'][1] = value  # No need to make a copy - datetime objects are immutable
+        self._date = value  # No need to make a copy - datetime objects are immutable
 
     @property
     def amount(self):
@@ -212,7 +203,7 @@ class Transaction(object):
 
         :return: float
         """
-        return self.data['Amount'][1]
+        return self._amount
 
     @amount.setter
     def amount(self, value):
@@ -221,7 +212,7 @@ class Transaction(object):
 
         :return: None
         """
-        self.data['Amount'][1] = round(float(value), 2)
+        self._amount = round(float(value), 2)
 
     @property
     def signed_amount(self):
@@ -248,128 +239,9 @@ class Transaction(object):
     #         self.transaction_type = 'debit'
     #         self.amount = -value
 
-    @property
-    def description(self):
-        """
-        Getter for property description, accessing data from internal Pandas Series
-        """
-        return self.data['Description'][1]
-
-    @description.setter
-    def description(self, value):
-        """
-        Setter for description property.
-
-        :param value:
-        :return:
-        """
-        self.data['Description'][1] = value
-
-    @property
-    def description_original(self):
-        """
-        Getter for property description_original, accessing data from internal Pandas Series
-        """
-        return self.data['Description Original'][1]
-
-    @description_original.setter
-    def description_original(self, value):
-        """
-        Setter for description_original property.
-
-        :param value:
-        :return:
-        """
-        self.data['Description Original'][1] = value
-
-    @property
-    def transaction_type(self):
-        """
-        Getter for property transaction_type, accessing data from internal Pandas Series
-        """
-        return self.data['Transaction Type'][1]
-
-    @transaction_type.setter
-    def transaction_type(self, value):
-        """
-        Setter for transaction_type property.
-
-        :param value:
-        :return:
-        """
-        self.data['Transaction Type'][1] = value
-
-    @property
-    def category(self):
-        """
-        Getter for property category, accessing data from internal Pandas Series
-        """
-        return self.data['Category'][1]
-
-    @category.setter
-    def category(self, value):
-        """
-        Setter for category property.
-
-        :param value:
-        :return:
-        """
-        self.data['Category'][1] = value
-
-    @property
-    def account(self):
-        """
-        Getter for property account, accessing data from internal Pandas Series
-        """
-        return self.data['Account'][1]
-
-    @account.setter
-    def account(self, value):
-        """
-        Setter for account property.
-
-        :param value:
-        :return:
-        """
-        self.data['Account'][1] = value
-
-    @property
-    def labels(self):
-        """
-        Getter for property labels, accessing data from internal Pandas Series
-        """
-        return self.data['Labels'][1]
-
-    @labels.setter
-    def labels(self, value):
-        """
-        Setter for labels property.
-
-        :param value:
-        :return:
-        """
-        self.data['Labels'][1] = value
-
-    @property
-    def notes(self):
-        """
-        Getter for property notes, accessing data from internal Pandas Series
-        """
-        return self.data['Notes'][1]
-
-    @notes.setter
-    def notes(self, value):
-        """
-        Setter for notes property.
-
-        :param value:
-        :return:
-        """
-        self.data['Notes'][1] = value
-
     @property
     def fields(self):
         """
-        Getter for property notes, accessing data from internal Pandas Series
+        Getter for property fields, the ordered list of the names of this transaction's fields
         """
-        return list(self.data.keys())
\ No newline at end of file
+        return list(self.FIELDS)
\ No newline at end of file
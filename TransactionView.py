@@ -0,0 +1,75 @@
+import pandas as pd
+from Transaction import Transaction
+
+
+def column_property(column):
+    """
+    Return a read-only property of a TransactionView that reads its row from a column.  Missing values are None.
+
+    :param column: Name of the column
+    :return: property
+    """
+    def getter(self):
+        value = self._columns[column][self._row]
+        return None if pd.isna(value) else value
+    return property(getter, doc=f"Getter for the {column} column of this view's row")
+
+
+class TransactionView(Transaction):
+    """
+    Read-only Transaction backed by one row of a Transactions DataFrame (see Transactions.iter_transactions).
+
+    Fields are read from the DataFrame's columns when they are accessed, so creating a view copies and parses nothing.
+    Views compare equal to, and convert (to_list, to_csv, etc.) the same as, a Transaction with the same data.
+    """
+    # Column of a Transactions DataFrame that each Transaction field is read from
+    FIELD_COLUMNS = {
+        "date": "Date",
+        "description": "Description",
+        "description_original": "Original Description",
+        "amount": "Amount",
+        "transaction_type": "Transaction Type",
+        "category": "Category",
+        "account": "Account Name",
+        "labels": "Labels",
+        "notes": "Notes",
+    }
+
+    __slots__ = ("_columns", "_row")
+
+    date = column_property("Date")
+    description = column_property("Description")
+    description_original = column_property("Original Description")
+    transaction_type = column_property("Transaction Type")
+    category = column_property("Category")
+    account = column_property("Account Name")
+    labels = column_property("Labels")
+    notes = column_property("Notes")
+
+    def __init__(self, columns, row):
+        """
+        Initialize a view of a row
+
+        :param columns: Dict of column name to array-like column data, shared by all views of the same DataFrame
+        :param row: Integer position of the row
+        """
+        self._columns = columns
+        self._row = row
+
+    @property
+    def amount(self):
+        """
+        Getter for amount property.  Transactions stores signed amounts, so this is the magnitude of the Amount column.
+
+        :return: float
+        """
+        return abs(float(self._columns["Amount"][self._row]))
+
+    @property
+    def signed_amount(self):
+        """
+        Getter for amount with a +/- sign, read directly from the Amount column
+
+        :return: float
+        """
+        return float(self._columns["Amount"][self._row])
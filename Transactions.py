@@ -1,8 +1,26 @@
 import calendar
+import hashlib
+import os
+import pickle
 import numpy as np
 import csv
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import count
 import pandas as pd
 from pprint import pprint
+from AggregateCube import AggregateCube, to_datetime64
+from TransactionView import TransactionView
+from TransactionsQuery import TransactionsQuery
+
+# Source of Transactions.version stamps (see Transactions.invalidate)
+VERSIONS = count()
+
+# Periods that transactions can be summarized by, their singular names and their lengths in months
+PERIODS = ['days', 'weeks', 'months', 'quarters', 'years']
+PERIOD_NAMES = {'days': 'day', 'weeks': 'week', 'months': 'month', 'quarters': 'quarter', 'years': 'year'}
+PERIOD_MONTHS = {'months': 1, 'quarters': 3, 'years': 12}
 
 class Transactions(object):
     """
@@ -20,12 +38,88 @@ class Transactions(object):
         "Notes": "object",
         }
 
+    # Periods that transactions can be summarized by (see by_period)
+    PERIODS = PERIODS
+
+    # Low-cardinality columns stored as pandas categoricals when compact storage is requested (see compact)
+    COMPACT_COLUMNS = ["Transaction Type", "Category", "Account Name", "Labels"]
+
+    # Columns that identify a transaction when merging overlapping exports (see merge).  Description and Category
+    # are left out because they can be edited in Mint between exports.
+    ID_COLUMNS = ["Date", "Original Description", "Amount", "Transaction Type", "Account Name"]
+
+    # Suffix appended to a csv file name to get its cache file (see from_csv)
+    CACHE_SUFFIX = ".cache"
+
 
     def __init__(self):
         """
         Initialize instance of class
         """
-        self.df = None
+        self._df = None
+        self.invalidate()
+
+    @property
+    def df(self):
+        """
+        DataFrame of transactions.  Assigning a new DataFrame discards anything derived from the old one.
+        """
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self.invalidate()
+
+    def compact(self):
+        """
+        Store COMPACT_COLUMNS (Category, Account Name, etc.) as pandas categoricals.
+
+        These columns have only a few distinct values, so storing each as small integer codes into a table of its
+        values takes a fraction of the memory of one Python string per row.  Values read back are the same strings, and
+        slices and summaries (slice_by_keys, by_month, etc.) of a compact instance are also compact.
+
+        :return: None
+        """
+        self.df = compact_df(self.df, self.COMPACT_COLUMNS)
+
+    def invalidate(self):
+        """
+        Discard indexes and aggregates cached from self.df and give this object a new version.
+
+        Versions are unique across all instances, so results computed from an instance (eg: Budget.tabulate_transactions)
+        can be cached by version.  This is done automatically whenever df is assigned or modified in place (see
+        check_cache).
+
+        :return: None
+        """
+        self._cache = {}
+        self._version = next(VERSIONS)
+        # Columns the caches are built from.  Holding them makes pandas copy a column on its next in-place change
+        # (copy-on-write), so any change to df gives it new column data (see df_columns_changed).
+        self._columns = None if self._df is None else list(self._df.items())
+
+    def check_cache(self):
+        """
+        Invalidate this object if df has been modified in place (eg: trxs.df['Amount'] *= 2) since it was last
+        invalidated.
+
+        Changes are found by comparing the length, names and data of df's columns to those held by invalidate, which
+        does not depend on the number of transactions.  Values set in place are only seen with pandas copy-on-write
+        (the default from pandas 3.0), so with older versions call invalidate after such changes.
+
+        :return: None
+        """
+        if df_columns_changed(self._df, self._columns):
+            self.invalidate()
+
+    @property
+    def version(self):
+        """
+        Integer that is different for every state of df of every instance (see invalidate)
+        """
+        self.check_cache()
+        return self._version
 
     def __len__(self):
         """
@@ -63,6 +157,16 @@ class Transactions(object):
             string += f"\n{self.transaction_as_str(i)}"
         return string
 
+    def query(self):
+        """
+        Return a lazy query of this object, for chaining slices without copying data at each step.
+
+        eg: trxs.query().slice_by_date(start, stop).slice_by_category(['Groceries']).by_month()
+
+        :return: TransactionsQuery instance
+        """
+        return TransactionsQuery(self)
+
     def slice_by_category(self, categories, return_anti_match=False):
         """
         Return a slice of the Transactions object, including transactions in any of the requested categories.
@@ -83,24 +187,60 @@ class Transactions(object):
                                  If True, return records that DO NOT match a key in keys.
         :return: A new Transactions instance
         """
+        if not isinstance(keys, list):
+            raise ValueError(f"Input keys is a {type(keys)}, must be list")
+
         trxs = Transactions()
+        trxs.df = self.df.iloc[self.positions_by_keys(column, keys, return_anti_match=return_anti_match)]
 
-        # Initialize an all-false boolean index
-        rows = self.df.index == None
+        return trxs
 
-        # Grab anything that was already matched (True in rows) or matches this cat
-        if not isinstance(keys, list):
-            raise ValueError(f"Input keys is a {type(keys)}, must be list")
-        for k in keys:
-            rows = (rows) | (self.df.loc[:, column] == k)
+    def positions_by_keys(self, column, keys, return_anti_match=False):
+        """
+        Return the row positions of records that match a list of keys in a given column, in the order of self.df.
+
+        Positions are looked up in the column's inverted index (see key_index) rather than by comparing every row to
+        every key, so the cost of a match is proportional to the number of matching records.
+
+        :param column: The column to match on
+        :param keys: A list of keys to match
+        :param return_anti_match: If True, return positions of records that DO NOT match a key in keys.
+        :return: Sorted ndarray of integer positions
+        """
+        index = self.key_index(column)
+        matched = [index[k] for k in dict.fromkeys(keys) if k in index]
+        if matched:
+            positions = np.sort(np.concatenate(matched))
+        else:
+            positions = np.array([], dtype=np.intp)
 
         # Invert the returned rows if required
         if return_anti_match:
-            rows = ~rows
+            rows = np.ones(len(self), dtype=bool)
+            rows[positions] = False
+            positions = np.flatnonzero(rows)
+        return positions
 
-        trxs.df = self.df.loc[rows]
+    def key_index(self, column):
+        """
+        Return an inverted index of a column, building and caching it if required.  Like the other caches, it is
+        rebuilt after df is assigned or modified in place (see check_cache).
 
-        return trxs
+        :param column: Column to index
+        :return: Dict of {value: sorted ndarray of row positions with that value}.  Missing values are not indexed.
+        """
+        self.check_cache()
+        cache_key = ('key_index', column)
+        if cache_key not in self._cache:
+            codes, uniques = pd.factorize(self.df[column])
+            # Group row positions by code (stable, so positions stay sorted within each group).  Missing values have
+            # code -1 and sort first.
+            order = np.argsort(codes, kind='stable')
+            n_missing = np.count_nonzero(codes < 0)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            groups = np.split(order[n_missing:], np.cumsum(counts)[:-1]) if len(uniques) else []
+            self._cache[cache_key] = dict(zip(uniques, groups))
+        return self._cache[cache_key]
 
     def slice_by_date(self, start=None, stop=None, increment=None):
         """
@@ -120,18 +260,63 @@ class Transactions(object):
                 raise ValueError("start ({0}) must be before stop ({1})".format(start, stop))
 
         newtrxs = Transactions()
+        newtrxs.df = self.df.iloc[self.positions_by_date(start, stop)]
+        return newtrxs
 
-        if start is None:
-            start = self.df['Date'].min()
-        if stop is None:
-            stop = self.df['Date'].max()
+    def positions_by_date(self, start=None, stop=None):
+        """
+        Return the row positions of transactions dated between start and stop (inclusive), in the order of self.df.
 
-        rows = (self.df['Date'] >= start) & (self.df['Date'] <= stop)
-        df_temp = self.df.loc[rows, :]
+        The range is found by binary search of the date index (see date_index), so the cost does not depend on the
+        number of transactions outside the range.  When the rows are sorted by date (eg: newest first, as exported by
+        Mint) the result is a contiguous slice.
 
-        # Do I need a copy here?  never sure with pd.dataframes...
-        newtrxs.df = df_temp
-        return newtrxs
+        :param start: (Optional) Start of date range, in date format.  If None, range starts at earliest record
+        :param stop: (Optional) End date for range, in date format.   If None, range ends at latest record
+        :return: slice if the rows are in date order, otherwise a sorted ndarray of integer positions
+        """
+        index = self.date_index()
+        dates = index['dates']
+
+        lo = 0 if start is None else np.searchsorted(dates, to_datetime64(start), side='left')
+        hi = index['n_valid'] if stop is None else np.searchsorted(dates, to_datetime64(stop), side='right')
+        hi = max(lo, min(hi, index['n_valid']))
+
+        order = index['order']
+        if order is None:
+            return slice(lo, hi)
+        elif isinstance(order, np.ndarray):
+            return np.sort(order[lo:hi])
+        else:
+            # Sorted newest first, so the index holds the dates reversed
+            return slice(len(dates) - hi, len(dates) - lo)
+
+    def date_index(self):
+        """
+        Return the index of this object's dates, building and caching it if required.
+
+        The index is a dict of:
+            dates: ndarray of datetime64[ns] of all dates in ascending order (NaT last)
+            order: None if self.df is sorted ascending by date, 'descending' if sorted newest first, otherwise an
+                   ndarray of the row positions in ascending date order
+            n_valid: Number of dates that are not NaT
+
+        :return: Dict
+        """
+        self.check_cache()
+        if 'date_index' not in self._cache:
+            dates = np.asarray(self.df['Date'], dtype='datetime64[ns]')
+            n_valid = len(dates) - np.count_nonzero(np.isnat(dates))
+            if n_valid == len(dates) and np.all(dates[1:] >= dates[:-1]):
+                order = None
+            elif n_valid == len(dates) and np.all(dates[1:] <= dates[:-1]):
+                order = 'descending'
+                dates = dates[::-1]
+            else:
+                order = np.argsort(dates, kind='stable')
+                dates = dates[order]
+            self._cache['date_index'] = {'dates': dates, 'order': order, 'n_valid': n_valid}
+        return self._cache['date_index']
 
     def sum(self):
         if isinstance(self.df, pd.DataFrame):
@@ -152,50 +337,157 @@ class Transactions(object):
                       If None, will stop with the most recent transaction
         :return: Transactions instance
         """
+        return self.by_period(by='months', ignore_blanks=ignore_blanks, combine_as=combine_as, start=start, stop=stop)
+
+    def by_period(self, by='months', ignore_blanks=True, combine_as=False, start=None, stop=None):
+        """
+        Return a new Transactions file that has a single entry for all spending in each category per period.
+
+        Works as by_month for any of the periods in PERIODS.  Each entry is dated at the last day of its period.
+
+        :param by: Length of each period, one of PERIODS ('days', 'weeks', 'months', 'quarters' or 'years')
+        :param ignore_blanks: See by_month
+        :param combine_as: See by_month
+        :param start: Starting date of the intervals to return (will be rounded to the start of its period)
+                      If None, will start with the oldest transaction
+        :param stop: End date of the intervals to return (will be rounded to the end of its period)
+                      If None, will stop with the most recent transaction
+        :return: Transactions instance
+        """
         if start is None:
-            start = self.df['Date'].min().replace(day=1)
+            start = period_shift(self.df['Date'].min(), 0, by=by)
         if stop is None:
             stop = self.df['Date'].max()
 
         # Build intervals to examine data over
-        # Incrementing by 0 months without other arguments sets to the end of current month
-        intervals = [(start, monthdelta(start, 0))]
-        while intervals[-1][-1] < stop:
-            next_start = monthdelta(intervals[-1][0], 1, day=1)
-            intervals.append((next_start, monthdelta(next_start, 0)))
+        lowers, uppers = period_intervals(start, stop, by=by)
 
+        # Total every category in every period at once
         categories = self.categories
-        # List of data Series to make into DataFrame
-        dss = []
-
-        for interval in intervals:
-            # Slice to this date range
-            trxs = self.slice_by_date(interval[0], interval[1])
-            # Get average spending for each category in this range
-            dss_temp = []
-            for cat in categories:
-                this_cat = trxs.slice_by_category([cat])
-                if len(this_cat) > 0 or ignore_blanks is False:
-                    amount = this_cat.sum()
-                    dss_temp.append(pd.Series({'Date': interval[1], 'Amount': amount, 'Category': cat, 'Description': f"1-month Summation"}))
-            if combine_as:
-                ds = pd.Series({'Date': interval[1], 'Amount': 0, 'Category': combine_as, 'Description': f"1-month Summation"})
-                for this_ds in dss_temp:
-                    ds.Amount += this_ds.Amount
-                dss.append(ds)
+        sums, counts = self.interval_totals(lowers, uppers, categories)
+        return self.period_summary(uppers, sums, counts, categories, f"1-{PERIOD_NAMES[by]} Summation",
+                                   ignore_blanks=ignore_blanks, combine_as=combine_as)
+
+    def combined_by_period(self, combine_as, categories, lower=None, upper=None, by='months', start=None, stop=None):
+        """
+        Sum the transactions in categories between lower and upper by period, combined into a single category.
+
+        This gives the same result as slice_by_date(lower, upper).slice_by_category(categories).by_period(by=by,
+        combine_as=combine_as, start=start, stop=stop), but is answered from the aggregate cube (see cube) with a few
+        lookups rather than by slicing the transactions.
+
+        :param combine_as: Name of the combined category
+        :param categories: List of categories to include
+        :param lower: (Optional) Earliest date of transactions to include
+        :param upper: (Optional) Latest date of transactions to include
+        :param by: Length of each period (see by_period)
+        :param start: See by_period.  If None, starts with the period of the oldest included transaction
+        :param stop: See by_period.  If None, stops with the most recent included transaction
+        :return: Transactions instance
+        """
+        cube = self.cube()
+        if start is None or stop is None:
+            daterange = cube.daterange(categories, lower, upper)
+            if daterange is None:
+                # Nothing to define the range with, so behave exactly as the slices would
+                return self.slice_by_date(lower, upper).slice_by_category(list(categories)).by_period(
+                    by=by, combine_as=combine_as, start=start, stop=stop)
+            if start is None:
+                start = period_shift(daterange[0], 0, by=by)
+            if stop is None:
+                stop = daterange[1]
+
+        lowers, uppers = period_intervals(start, stop, by=by)
+        # Only count transactions between lower and upper
+        included_lowers = lowers if lower is None else np.maximum(lowers, to_datetime64(lower))
+        included_uppers = uppers if upper is None else np.minimum(uppers, to_datetime64(upper))
+        sums, counts = cube.interval_totals(included_lowers, included_uppers, categories)
+        return self.period_summary(uppers, sums, counts, np.asarray(categories, dtype=object),
+                                   f"1-{PERIOD_NAMES[by]} Summation", combine_as=combine_as)
+
+    def period_summary(self, uppers, sums, counts, categories, description, ignore_blanks=True, combine_as=False):
+        """
+        Format totals for a series of periods as a Transactions instance in the format returned by by_period.
+
+        :param uppers: ndarray of the end date of each period
+        :param sums: ndarray of shape (periods, categories) of the total spent in each period and category
+        :param counts: ndarray of shape (periods, categories) of the number of transactions in each period and category
+        :param categories: ndarray of categories
+        :param description: String description of every entry
+        :param ignore_blanks: See by_month
+        :param combine_as: See by_month
+        :return: Transactions instance
+        """
+        if combine_as:
+            df = self.summary_df(uppers, sums.sum(axis=1), np.full(len(uppers), combine_as, dtype=object),
+                                 description)
+        else:
+            if ignore_blanks:
+                periods, cats = np.nonzero(counts > 0)
             else:
-                dss.extend(dss_temp)
-        df = pd.DataFrame(dss)
+                periods, cats = np.nonzero(np.ones_like(counts, dtype=bool))
+            df = self.summary_df(uppers[periods], sums[periods, cats], categories[cats], description)
         trxs_new = Transactions()
         trxs_new.df = df
         return trxs_new
 
+    def interval_totals(self, lowers, uppers, categories):
+        """
+        Total the transactions in each category over each of a series of date intervals.
+
+        Totals are looked up in this object's aggregate cube (see cube), so repeated calls do not re-scan the data.
+
+        :param lowers: Start dates of the intervals (inclusive)
+        :param uppers: End dates of the intervals (inclusive)
+        :param categories: ndarray of categories to total
+        :return: Tuple of (sums, counts), each an ndarray of shape (intervals, categories)
+        """
+        return self.cube().interval_totals(lowers, uppers, categories)
+
+    def cube(self):
+        """
+        Return the aggregate cube of this object's transactions (cumulative totals by date and category), building and
+        caching it if required.
+
+        :return: AggregateCube instance
+        """
+        self.check_cache()
+        if 'cube' not in self._cache:
+            self._cache['cube'] = AggregateCube.from_df(self.df)
+        return self._cache['cube']
+
+    def summary_df(self, dates, amounts, categories, description):
+        """
+        Build a DataFrame of summarized transactions in the format returned by by_month and moving_average.
+
+        Category is stored as a categorical if this object's is (see compact).
+
+        :param dates: ndarray of datetime64 dates of each summary
+        :param amounts: ndarray of amounts
+        :param categories: ndarray of categories
+        :param description: String description shared by all rows
+        :return: DataFrame
+        """
+        # Match the resolution of this object's dates
+        date_dtype = 'datetime64[ns]'
+        if isinstance(self.df, pd.DataFrame) and np.issubdtype(self.df['Date'].dtype, np.datetime64):
+            date_dtype = self.df['Date'].dtype
+        df = pd.DataFrame({
+            'Date': np.asarray(dates, dtype='datetime64[ns]').astype(date_dtype),
+            'Amount': np.asarray(amounts, dtype='float64'),
+            'Category': np.asarray(categories, dtype=object),
+            'Description': description,
+        })
+        if is_compact(self.df, 'Category'):
+            df = compact_df(df, ['Category'])
+        return df
+
     def moving_average(self, by='months', n=1, start=None, stop=None, include_partials=False):
         """
         Return a DataFrame summarizing the rolling average over n_months of spending in each category.
 
         Dates in the returned DataFrame are the month/year of the last day in each interval.  Columns are the categories
-        :param by: Type of increment to average over (currently supports only "months")
+        :param by: Type of increment to average over, one of PERIODS ('days', 'weeks', 'months', 'quarters' or 'years')
         :param n: Number of increments of 'by' to average over (days, months, years...)
         :param start: Starting date of the intervals to return (will be rounded to the start of the month)
                       Note that this will be the date of the first INTERVAL returned, meaning the first interval will
@@ -206,7 +498,7 @@ class Transactions(object):
         :param include_partials: Generate results even when
         :return:
         """
-        if by != 'months':
+        if by not in PERIODS:
             raise NotImplementedError
         # FEATURE: Should this function return intervals starting at start (so for n_months > 1, this interval would be incomplete) or from start + n_months - 1?
         # Get start and end dates, if not specified.  Use first and last purchase.
@@ -217,28 +509,97 @@ class Transactions(object):
 
         # Round to start down to day 1 of the n-1th month preceeding start (to make sure the first interval ends at the
         # end of the month set by start)
-        start = monthdelta(start, -(n-1), day=1)
+        start = period_shift(start, -(n - 1), by=by)
 
         # Round stop to the end of the last month
-        stop = lastday(stop)
+        stop = period_end(stop, by=by)
 
-        intervals = month_intervals(start, stop, n_months=n)
+        # Total each period once.  Each n-period window is then the sum of n consecutive periods, taken from prefix
+        # sums so the cost does not depend on n.  Periods are totalled over [first day, last day] and, separately, over
+        # the gap before the next period starts (only non-empty for transactions with a time of day), which is inside
+        # every window except one ending that period.
+        window_uppers = period_intervals(start, stop, by=by, n=n)[1]
+        lowers, uppers = period_intervals(start, window_uppers[-1], by=by)
+        gap_lowers = uppers[:-1] + np.timedelta64(1, 'ns')
+        gap_uppers = lowers[1:] - np.timedelta64(1, 'ns')
         categories = self.categories
+        sums, _ = self.interval_totals(np.concatenate([lowers, gap_lowers]), np.concatenate([uppers, gap_uppers]),
+                                       categories)
+        periods, gaps = sums[:len(lowers)], sums[len(lowers):]
+
+        n_windows = len(window_uppers)
+        amounts = window_sums(periods, n)
+        if n > 1:
+            amounts += window_sums(gaps, n - 1)
+        amounts /= float(n)
+
+        df = self.summary_df(np.repeat(window_uppers, len(categories)), amounts.ravel(),
+                             np.tile(categories, n_windows), f"{n}-{PERIOD_NAMES[by]} Average")
         trxs_new = Transactions()
-        # List of data Series to make into DataFrame
-        dss = []
-
-        for interval in intervals:
-            # Slice to this date range
-            trxs = self.slice_by_date(interval[0], interval[1])
-            # Get average spending for each category in this range
-            for cat in categories:
-                amount = trxs.slice_by_category([cat]).sum() / float(n)
-                dss.append(pd.Series({'Date': interval[1], 'Amount': amount, 'Category': cat, 'Description': f"{n}-month Average"}))
-        df = pd.DataFrame(dss)
         trxs_new.df = df
         return trxs_new
 
+    def merge(self, other):
+        """
+        Add the transactions in other that are not already in this object (eg: a new export that overlaps this one).
+
+        Transactions are matched on ID_COLUMNS by hashing each row, and the hashes of this object's rows are cached,
+        so the cost of a merge grows with the size of other rather than the size of this object.  If the aggregate cube
+        (see cube) has been built, only the cells of the added rows are updated.  Matching counts
+        repeats, so a transaction that appears twice in other but once here is added once.  The merged DataFrame is
+        sorted by date like from_csvs and given a new integer index.
+
+        :param other: Transactions instance to merge into this one
+        :return: Transactions instance of only the rows that were added
+        """
+        counts = self.row_hash_counts()
+        cube = self._cache.get('cube')
+
+        hashes = pd.Series(row_hashes(other.df))
+        # Keep the rows of other that repeat a transaction more times than it is already present
+        occurrence = hashes.groupby(hashes).cumcount()
+        keep = (occurrence >= hashes.map(counts).fillna(0)).values
+
+        added = Transactions()
+        added.df = other.df.loc[keep]
+
+        if len(self) == 0:
+            self.df = sort_by_date(added.df)
+        else:
+            self.df = sort_by_date(concat_dfs([added.df, self.df], ignore_index=True))
+        counts.update(hashes[keep].tolist())
+        self._cache['row_hash_counts'] = counts
+
+        # Keep the aggregate cube up to date rather than rebuilding it from the full history
+        if cube is not None:
+            cube.add_df(added.df)
+            self._cache['cube'] = cube
+        return added
+
+    def append_csv(self, csv_file, **kwargs):
+        """
+        Merge the transactions from a Mint-formatted csv file into this object, skipping any already present.
+
+        :param csv_file: Transaction file name
+        :param kwargs: Additional arguments passed to from_csv
+        :return: Transactions instance of only the rows that were added
+        """
+        return self.merge(Transactions.from_csv(csv_file, **kwargs))
+
+    def row_hash_counts(self):
+        """
+        Return a Counter of how many times each row hash (see row_hashes) occurs in this object.  Cached until df changes.
+
+        :return: Counter
+        """
+        self.check_cache()
+        if 'row_hash_counts' not in self._cache:
+            if len(self) == 0:
+                self._cache['row_hash_counts'] = Counter()
+            else:
+                self._cache['row_hash_counts'] = Counter(row_hashes(self.df).tolist())
+        return self._cache['row_hash_counts']
+
     def get_dates(self):
         """
         Return a list of the dates for all transactions, in order of self.df
@@ -261,32 +622,180 @@ class Transactions(object):
         """
         return (self.df['Date'].min(), self.df['Date'].max())
 
+    def iter_transactions(self):
+        """
+        Generator of a read-only TransactionView of each transaction, in order of self.df
+
+        Views read their fields from the columns of self.df when accessed, so nothing is copied or parsed per row.
+
+        :return: Generator of TransactionView instances
+        """
+        columns = {column: self.df[column].array for column in self.df.columns}
+        for row in range(len(self.df)):
+            yield TransactionView(columns, row)
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        """
+        Initialize instance from an iterable of Transaction (or TransactionView) instances
+
+        The fields of every transaction are collected into one list per column in a single pass, and then normalized as
+        whole columns (see normalize_df).
+
+        :param transactions: Iterable of Transaction instances
+        :return: Instance of Transactions class
+        """
+        columns = {column: [] for column in TransactionView.FIELD_COLUMNS.values()}
+        appends = [(field, columns[column].append) for field, column in TransactionView.FIELD_COLUMNS.items()]
+        for trx in transactions:
+            for field, append in appends:
+                append(getattr(trx, field))
+        df = pd.DataFrame(columns)
+        df['Date'] = pd.to_datetime(df['Date'])
+        # Store missing fields as NaN, the same as read_csv
+        df = df.fillna(np.nan)
+
+        trxs = cls()
+        trxs.df = cls.normalize_df(df)
+        return trxs
+
     @classmethod
-    def from_csv(cls, csv_file):
+    def from_csv(cls, csv_file, chunksize=None, cache=False, compact=False):
         """
         Initialize instance from a Mint-formatted csv file of transactions
 
         :param csv_file: Transaction file name
+        :param chunksize: (Optional) If an integer, read and normalize the file chunksize rows at a time (see
+                          iter_csv) and accumulate the normalized chunks.  The result is the same as reading the file
+                          in one pass, but the raw parse of the file is never held in memory all at once.
+        :param cache: If True, the normalized DataFrame is stored in a binary file next to csv_file (csv_file +
+                      CACHE_SUFFIX) and later calls load it from there instead of parsing the csv.  The cache is keyed
+                      on a hash of the file contents, the ingest options and the pandas and pickle versions, so it is
+                      rebuilt whenever any of them change or the cache cannot be loaded, and not stored if it cannot be
+                      written.
+        :param compact: If True, store COMPACT_COLUMNS as categoricals (see compact)
         :return: Instance of Transactions class
         """
-        # Read csv
-        df = pd.read_csv(csv_file, skipinitialspace = True,  quoting = csv.QUOTE_ALL, parse_dates = ['Date'],
-                         dtype = cls.MINT_DTYPES)
+        df = None
+        if cache:
+            if not isinstance(csv_file, (str, os.PathLike)):
+                raise ValueError(f"cache requires csv_file to be a file path, not a {type(csv_file)}")
+            cache_file = os.fspath(csv_file) + cls.CACHE_SUFFIX
+            key = file_hash(csv_file, dtypes=cls.MINT_DTYPES, compact=compact, pandas=pd.__version__,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            df = read_cache(cache_file, key)
 
-        # Convert Amount column into signed amount
-        df.loc[:, 'Amount'] = df.apply(signed_amount, axis = 1)
+        if df is None:
+            if chunksize is None:
+                # Read csv
+                df = cls.normalize_df(cls.read_csv(csv_file), compact=compact)
+            else:
+                df = concat_dfs([chunk.df for chunk in cls.iter_csv(csv_file, chunksize=chunksize, compact=compact)])
+            if cache:
+                try:
+                    write_cache(cache_file, key, df)
+                except OSError:
+                    # The cache only saves time, so failing to write it (eg: read-only directory) is not an error
+                    pass
 
         trxs = Transactions()
         trxs.df = df
         return trxs
 
+    @classmethod
+    def from_csvs(cls, csv_files, workers=None, **kwargs):
+        """
+        Initialize a single instance from several Mint-formatted csv files (eg: one export per account or year)
+
+        Files are parsed in parallel in a process pool and merged into one DataFrame sorted by date, newest first (the
+        same order Mint exports use).  The sort is stable, so transactions on the same date keep the order of csv_files
+        and then their order within each file.  The merged DataFrame is given a new integer index.
+
+        :param csv_files: List of transaction file names
+        :param workers: (Optional) Number of processes to parse with.  If None, uses the number of CPUs.  If 1, files
+                        are parsed serially in this process.
+        :param kwargs: Additional arguments passed to from_csv for each file
+        :return: Instance of Transactions class
+        """
+        csv_files = list(csv_files)
+        if not csv_files:
+            raise ValueError("csv_files is empty, must include at least one csv file")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(csv_files))
+
+        read = partial(cls.from_csv, **kwargs)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                dfs = [trxs.df for trxs in executor.map(read, csv_files)]
+        else:
+            dfs = [read(csv_file).df for csv_file in csv_files]
+
+        trxs = Transactions()
+        trxs.df = sort_by_date(concat_dfs(dfs, ignore_index=True))
+        return trxs
+
+    @classmethod
+    def iter_csv(cls, csv_file, chunksize=100000, compact=False):
+        """
+        Generator that streams a Mint-formatted csv file as Transactions instances of at most chunksize rows each.
+
+        Each chunk is normalized the same way as from_csv and only one chunk is read at a time, so peak memory is
+        bounded by chunksize regardless of the size of the file.  Chunks keep their row index from the file.
+
+        :param csv_file: Transaction file name
+        :param chunksize: Maximum number of rows in each yielded Transactions instance
+        :param compact: If True, store COMPACT_COLUMNS as categoricals (see compact)
+        :return: Generator of Transactions instances
+        """
+        with cls.read_csv(csv_file, chunksize=chunksize) as reader:
+            for df in reader:
+                trxs = Transactions()
+                trxs.df = cls.normalize_df(df, compact=compact)
+                yield trxs
+
+    @classmethod
+    def read_csv(cls, csv_file, **kwargs):
+        """
+        Read a Mint-formatted csv file into a raw (not yet normalized) DataFrame
+
+        :param csv_file: Transaction file name
+        :param kwargs: Additional arguments passed to pd.read_csv (eg: chunksize)
+        :return: DataFrame, or a pandas TextFileReader if chunksize is given
+        """
+        return pd.read_csv(csv_file, skipinitialspace = True,  quoting = csv.QUOTE_ALL, parse_dates = ['Date'],
+                           dtype = cls.MINT_DTYPES, **kwargs)
+
+    @classmethod
+    def normalize_df(cls, df, compact=False):
+        """
+        Normalize a DataFrame read from a Mint csv file, operating on whole columns at once.
+
+        Columns are coerced to MINT_DTYPES, every Transaction Type is validated and Amount is converted into a signed
+        amount (debits are negative).  df is modified in place.
+
+        :param df: DataFrame of raw Mint data
+        :param compact: If True, store COMPACT_COLUMNS as categoricals (see compact)
+        :return: The normalized DataFrame
+        """
+        dtypes = {col: dtype for col, dtype in cls.MINT_DTYPES.items() if col in df.columns and df[col].dtype != dtype}
+        if dtypes:
+            df = df.astype(dtypes)
+
+        # Convert Amount column into signed amount
+        df['Amount'] = signed_amounts(df['Amount'].values, df['Transaction Type'].values, index=df.index)
+
+        if compact:
+            df = compact_df(df, cls.COMPACT_COLUMNS)
+        return df
+
     @property
     def categories(self):
         """
         Returns an ndarray of the categories used in this Transactions object
         """
         try:
-            return self.df['Category'].unique()
+            return np.asarray(self.df['Category'].unique())
         except KeyError:
             return np.array([])
 
@@ -297,7 +806,328 @@ def signed_amount(ds):
     elif ds['Transaction Type'] == 'debit':
         return -ds['Amount']
     else:
-        raise ValueError(f"Invalid transaction_type {ds.transaction_type}")
+        raise ValueError(f"Invalid transaction_type {ds['Transaction Type']}")
+
+def signed_amounts(amounts, transaction_types, index=None):
+    """
+    Vectorized version of signed_amount, returning an array of amounts where debits are negative.
+
+    All transaction types are validated before anything is returned, and a single ValueError listing every invalid
+    row is raised if any are not 'credit' or 'debit'.
+
+    :param amounts: Array of (unsigned) amounts
+    :param transaction_types: Array of transaction types, the same length as amounts
+    :param index: (Optional) Labels used to identify rows in error messages.  If None, row positions are used
+    :return: ndarray of float64
+    """
+    transaction_types = np.asarray(transaction_types, dtype=object)
+    is_debit = transaction_types == 'debit'
+    invalid = ~(is_debit | (transaction_types == 'credit'))
+    if invalid.any():
+        rows = np.flatnonzero(invalid)
+        if index is not None:
+            rows = np.asarray(index)[rows]
+        bad = ", ".join(f"{row}: {transaction_types[i]!r}" for row, i in zip(rows, np.flatnonzero(invalid)))
+        raise ValueError(f"Invalid transaction_type in {invalid.sum()} row(s) ({bad})")
+    amounts = np.asarray(amounts, dtype='float64')
+    return np.where(is_debit, -amounts, amounts)
+
+def file_hash(filename, **options):
+    """
+    Return a hex digest identifying the contents of a file plus any options used to interpret it.
+
+    :param filename: File to hash
+    :param options: Keyword options to include in the hash (must have a stable repr)
+    :return: String
+    """
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(partial(f.read, 1 << 20), b''):
+            h.update(block)
+    h.update(repr(sorted(options.items())).encode())
+    return h.hexdigest()
+
+def read_cache(cache_file, key):
+    """
+    Return the DataFrame stored in cache_file if it was stored with the same key, otherwise None.
+
+    A cache that cannot be read or unpickled (eg: it is truncated, or was written by an incompatible version of pandas)
+    is treated as missing, so the caller rebuilds it.
+
+    :param cache_file: Cache file name (does not need to exist)
+    :param key: Key the DataFrame must have been written with (see file_hash)
+    :return: DataFrame or None
+    """
+    try:
+        with open(cache_file, 'rb') as f:
+            # Key is stored first so a stale cache is rejected without loading its data
+            if pickle.load(f) != key:
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ImportError, AttributeError, ValueError):
+        return None
+
+def write_cache(cache_file, key, df):
+    """
+    Store a DataFrame in cache_file under key, replacing any existing cache.
+
+    :param cache_file: Cache file name
+    :param key: Key to store with the data (see file_hash)
+    :param df: DataFrame to store
+    :return: None
+    """
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # Don't leave a partial file behind
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+def row_hashes(df, columns=None):
+    """
+    Return a uint64 hash of each row of df, computed from the values in columns.
+
+    :param df: DataFrame
+    :param columns: (Optional) Columns to hash.  If None, uses Transactions.ID_COLUMNS
+    :return: ndarray of uint64
+    """
+    if columns is None:
+        columns = Transactions.ID_COLUMNS
+    return pd.util.hash_pandas_object(df[columns], index=False).values
+
+def df_columns_changed(df, columns):
+    """
+    Return True if the columns of df are not those in columns, or hold different data.
+
+    :param df: DataFrame or None
+    :param columns: List of (name, Series) from df.items() when df was last checked, or None if df was None
+    :return: Boolean
+    """
+    if df is None or columns is None:
+        return df is not None or columns is not None
+    if len(df.columns) != len(columns):
+        return True
+    for (name, column), (old_name, old_column) in zip(df.items(), columns):
+        if name != old_name or len(column) != len(old_column) or column_data(column) != column_data(old_column):
+            return True
+    return False
+
+def column_data(column):
+    """
+    Return an identifier of the memory holding a column's values, without copying them.
+
+    :param column: Series
+    :return: Integer address of the column's values, or id of its array for arrays not backed by numpy
+    """
+    values = column.array
+    if isinstance(values, pd.Categorical):
+        values = values.codes
+    elif isinstance(values, (pd.arrays.DatetimeArray, pd.arrays.TimedeltaArray, pd.arrays.PeriodArray)):
+        values = values.asi8
+    elif isinstance(values, pd.arrays.NumpyExtensionArray):
+        values = values.to_numpy()
+    else:
+        return id(values)
+    return values.__array_interface__['data'][0]
+
+def compact_df(df, columns):
+    """
+    Return df with columns converted to pandas categoricals.  Columns not in df are ignored.
+
+    :param df: DataFrame
+    :param columns: List of column names
+    :return: DataFrame
+    """
+    dtypes = {col: 'category' for col in columns if col in df.columns and not is_compact(df, col)}
+    if dtypes:
+        df = df.astype(dtypes)
+    return df
+
+def is_compact(df, column):
+    """
+    Return True if column of df is stored as a pandas categorical
+
+    :param df: DataFrame
+    :param column: Column name
+    :return: Boolean
+    """
+    return isinstance(df, pd.DataFrame) and column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype)
+
+def concat_dfs(dfs, **kwargs):
+    """
+    Concatenate DataFrames with pd.concat, keeping columns that are categorical in every DataFrame categorical.
+
+    pd.concat falls back to object columns when categoricals have different categories, so the categories of each
+    such column are unioned first.
+
+    :param dfs: List of DataFrames
+    :param kwargs: Additional arguments passed to pd.concat
+    :return: DataFrame
+    """
+    dfs = list(dfs)
+    if len(dfs) > 1:
+        for col in dfs[0].columns:
+            if all(is_compact(df, col) for df in dfs):
+                categories = dfs[0][col].cat.categories
+                for df in dfs[1:]:
+                    categories = categories.append(df[col].cat.categories.difference(categories))
+                dfs = [df.assign(**{col: df[col].cat.set_categories(categories)}) for df in dfs]
+    return pd.concat(dfs, **kwargs)
+
+def sort_by_date(df):
+    """
+    Return a copy of df stably sorted by Date, newest first, with a new integer index.
+
+    :param df: DataFrame with a Date column
+    :return: DataFrame
+    """
+    return df.sort_values('Date', ascending=False, kind='stable').reset_index(drop=True)
+
+def window_sums(values, n):
+    """
+    Return the sums of every n consecutive rows of values, computed from prefix sums.
+
+    :param values: ndarray of shape (rows, ...)
+    :param n: Number of rows in each window
+    :return: ndarray of shape (rows - n + 1, ...) where row i is the sum of values[i:i + n]
+    """
+    values = np.asarray(values, dtype='float64')
+    prefix = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    return prefix[n:] - prefix[:-n]
+
+def period_codes(dates, by='months'):
+    """
+    Return an integer code for the period each date falls in.  Codes count periods from the start of 1970.
+
+    Weeks start on Monday and quarters start in January, April, July and October.
+
+    :param dates: Array-like of dates
+    :param by: One of PERIODS
+    :return: ndarray of int64
+    """
+    days = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]')
+    if by == 'days':
+        return days.astype(np.int64)
+    elif by == 'weeks':
+        # 1970-01-01 was a Thursday
+        return (days.astype(np.int64) + 3) // 7
+    months = days.astype('datetime64[M]').astype(np.int64)
+    if by == 'months':
+        return months
+    elif by == 'quarters':
+        return months // 3
+    elif by == 'years':
+        return months // 12
+    raise ValueError(f"Invalid period '{by}', must be one of {PERIODS}")
+
+def period_starts(codes, by='months'):
+    """
+    Return the first day of each period code (see period_codes).
+
+    :param codes: Array-like of integer period codes
+    :param by: One of PERIODS
+    :return: ndarray of datetime64[ns]
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    if by == 'days':
+        days = codes.astype('datetime64[D]')
+    elif by == 'weeks':
+        days = (codes * 7 - 3).astype('datetime64[D]')
+    elif by in PERIOD_MONTHS:
+        days = (codes * PERIOD_MONTHS[by]).astype('datetime64[M]').astype('datetime64[D]')
+    else:
+        raise ValueError(f"Invalid period '{by}', must be one of {PERIODS}")
+    return days.astype('datetime64[ns]')
+
+def time_of_day(date):
+    """
+    Return the time elapsed since midnight of a date.
+
+    :param date: Date
+    :return: numpy.timedelta64 in ns
+    """
+    date = to_datetime64(date)
+    return date - date.astype('datetime64[D]').astype('datetime64[ns]')
+
+def period_shift(date, delta, by='months'):
+    """
+    Return the first day of the period delta periods away from the period of date, keeping date's time of day.
+
+    eg: period_shift(date, 0, 'months') is the same as date.replace(day=1)
+
+    :param date: Date
+    :param delta: Integer number of periods to shift by
+    :param by: One of PERIODS
+    :return: Timestamp (NaT if date is NaT)
+    """
+    if pd.isna(date):
+        return pd.NaT
+    code = period_codes([date], by=by)[0] + delta
+    return pd.Timestamp(period_starts([code], by=by)[0] + time_of_day(date))
+
+def period_end(date, by='months'):
+    """
+    Return the last day of the period of date, keeping date's time of day (the same as lastday for months).
+
+    :param date: Date
+    :param by: One of PERIODS
+    :return: Timestamp (NaT if date is NaT)
+    """
+    if pd.isna(date):
+        return pd.NaT
+    code = period_codes([date], by=by)[0] + 1
+    return pd.Timestamp(period_starts([code], by=by)[0] - np.timedelta64(1, 'D') + time_of_day(date))
+
+def period_intervals(start, stop, by='months', n=1):
+    """
+    Return the start and end dates of consecutive n-period intervals, computed as arrays.
+
+    The first interval starts at start and ends at the end of the (n-1)th period after start.  Each following interval
+    starts one period later, on the first day of a period, and intervals continue until one ends at or after stop.
+    All dates keep start's time of day.  For months this matches month_intervals.
+
+    :param start: Date of the start of the first interval
+    :param stop: Date that the last interval must reach.  If NaT, only the first interval is returned
+    :param by: One of PERIODS
+    :param n: Number of periods in each interval
+    :return: Tuple of (starts, ends), each a read-only ndarray of datetime64[ns]
+    """
+    start, stop = to_datetime64(start), to_datetime64(stop)
+    # NaT must never reach the integer period codes (or the memoized keys)
+    if np.isnat(start):
+        raise ValueError("start of the intervals must be a date, not NaT")
+    if np.isnat(stop):
+        # No stop (eg: the latest date of no transactions), so return the single interval starting at start
+        stop = start
+
+    # Intervals are memoized, as the same ranges are requested repeatedly (eg: once per budget and moving average)
+    return cached_period_intervals(start, stop, by, n)
+
+@lru_cache(maxsize=1024)
+def cached_period_intervals(start, stop, by, n):
+    """
+    Compute period_intervals for start and stop as numpy.datetime64 (neither NaT).  Use period_intervals instead.
+    """
+    offset = time_of_day(start)
+    first = period_codes([start], by=by)[0]
+
+    # The last interval ends in the period of stop, or the next one if stop is later in the day than start
+    last = period_codes([stop], by=by)[0]
+    if period_starts([last + 1], by=by)[0] - np.timedelta64(1, 'D') + offset < stop:
+        last += 1
+    codes = first + np.arange(max(1, last - (first + n - 1) + 1))
+
+    starts = period_starts(codes, by=by) + offset
+    ends = period_starts(codes + n, by=by) - np.timedelta64(1, 'D') + offset
+    starts[0] = start
+    starts.setflags(write=False)
+    ends.setflags(write=False)
+    return starts, ends
 
 def monthdelta(date, delta, day=None):
     """
@@ -330,11 +1160,15 @@ def lastday(date):
 
 
 def month_intervals(start, stop, n_months=1):
-    # Build intervals to examine data over
-    intervals = [(start, monthdelta(start, n_months - 1))]
+    """
+    Return a list of (start, end) tuples of n_months-month intervals from start until an interval ends at or after stop.
 
-    while intervals[-1][-1] < stop:
-        next_start = monthdelta(intervals[-1][0], 1, day=1)
-        intervals.append((next_start, monthdelta(next_start, n_months - 1)))
+    Kept for compatibility.  Use period_intervals, which returns the same intervals as arrays.
 
-    return intervals
\ No newline at end of file
+    :param start: Date of the start of the first interval
+    :param stop: Date that the last interval must reach
+    :param n_months: Number of months in each interval
+    :return: List of tuples of Timestamps
+    """
+    starts, ends = period_intervals(start, stop, by='months', n=n_months)
+    return [(pd.Timestamp(lower), pd.Timestamp(upper)) for lower, upper in zip(starts, ends)]
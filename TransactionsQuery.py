@@ -0,0 +1,186 @@
+import numpy as np
+
+
+class TransactionsQuery(object):
+    """
+    Lazy query on a Transactions object, built by chaining slices (eg: trxs.query().slice_by_date(...).by_month()).
+
+    Slicing methods only record a predicate and return a new query.  Nothing is sliced until data or an aggregate is
+    requested, at which point all predicates are resolved to row positions using the Transactions indexes and
+    combined, and the DataFrame is sliced once.
+    """
+
+    def __init__(self, trxs, predicates=()):
+        """
+        Initialize a query of trxs
+
+        :param trxs: Transactions instance to query
+        :param predicates: (Optional) Tuple of predicates already applied (see slice_by_date and slice_by_keys)
+        """
+        self.trxs = trxs
+        self.predicates = tuple(predicates)
+
+    def __len__(self):
+        """
+        Returns number of transactions matched by the query.
+
+        :return: Integer length
+        """
+        positions = self.positions()
+        if isinstance(positions, slice):
+            return len(range(*positions.indices(len(self.trxs))))
+        return len(positions)
+
+    def slice_by_date(self, start=None, stop=None):
+        """
+        Return a new query that also restricts transactions to a date range (see Transactions.slice_by_date)
+
+        :param start: (Optional) Start of date range, in date format.  If omitted, range is not limited at the start
+        :param stop: (Optional) End date for range, in date format.   If omitted, range is not limited at the end
+        :return: A new TransactionsQuery instance
+        """
+        if start is not None and stop is not None:
+            if start > stop:
+                raise ValueError("start ({0}) must be before stop ({1})".format(start, stop))
+        return TransactionsQuery(self.trxs, self.predicates + (('date', start, stop),))
+
+    def slice_by_category(self, categories, return_anti_match=False):
+        """
+        Return a new query that also restricts transactions to (or excludes) a list of categories
+
+        :param categories: List of categories
+        :param return_anti_match: If True, match transactions that are NOT in any of categories
+        :return: A new TransactionsQuery instance
+        """
+        return self.slice_by_keys('Category', categories, return_anti_match=return_anti_match)
+
+    def slice_by_keys(self, column, keys, return_anti_match=False):
+        """
+        Return a new query that also restricts transactions to (or excludes) a list of keys in a given column (see
+        Transactions.slice_by_keys)
+
+        :param column: The column to slice on
+        :param keys: A list of keys
+        :param return_anti_match: If True, match records that DO NOT match a key in keys.
+        :return: A new TransactionsQuery instance
+        """
+        if not isinstance(keys, list):
+            raise ValueError(f"Input keys is a {type(keys)}, must be list")
+        return TransactionsQuery(self.trxs, self.predicates + (('keys', column, list(keys), return_anti_match),))
+
+    def positions(self):
+        """
+        Resolve all predicates into the row positions of trxs that match every one of them.
+
+        :return: slice or sorted ndarray of integer positions (see Transactions.positions_by_date)
+        """
+        positions = slice(0, len(self.trxs))
+        for predicate in self.predicates:
+            if predicate[0] == 'date':
+                matched = self.trxs.positions_by_date(predicate[1], predicate[2])
+            else:
+                matched = self.trxs.positions_by_keys(predicate[1], predicate[2], return_anti_match=predicate[3])
+            positions = intersect_positions(positions, matched)
+        return positions
+
+    def to_transactions(self):
+        """
+        Materialize the query as a new Transactions instance
+
+        :return: Transactions instance
+        """
+        trxs = type(self.trxs)()
+        trxs.df = self.trxs.df.iloc[self.positions()]
+        return trxs
+
+    @property
+    def df(self):
+        """
+        DataFrame of the transactions matched by the query
+        """
+        return self.to_transactions().df
+
+    def sum(self):
+        """
+        Return the sum of the amounts of all matched transactions, without materializing the other columns
+
+        :return: Float
+        """
+        if len(self.trxs) == 0:
+            return 0.0
+        return self.trxs.df['Amount'].iloc[self.positions()].sum()
+
+    def by_month(self, ignore_blanks=True, combine_as=False, start=None, stop=None):
+        """
+        Summarize the matched transactions by month (see Transactions.by_month and by_period)
+
+        :return: Transactions instance
+        """
+        return self.by_period(by='months', ignore_blanks=ignore_blanks, combine_as=combine_as, start=start, stop=stop)
+
+    def by_period(self, by='months', ignore_blanks=True, combine_as=False, start=None, stop=None):
+        """
+        Summarize the matched transactions by period (see Transactions.by_period)
+
+        If the categories are combined (combine_as) and the query only restricts dates and categories, the summary is
+        looked up in the aggregate cube of the Transactions (see Transactions.combined_by_period) without slicing.
+        Otherwise the query is materialized first.
+
+        :return: Transactions instance
+        """
+        selection = self.cube_selection() if combine_as else None
+        if selection is None:
+            return self.to_transactions().by_period(by=by, ignore_blanks=ignore_blanks, combine_as=combine_as,
+                                                    start=start, stop=stop)
+        lower, upper, categories = selection
+        return self.trxs.combined_by_period(combine_as, categories, lower=lower, upper=upper, by=by, start=start,
+                                            stop=stop)
+
+    def cube_selection(self):
+        """
+        Reduce the predicates to a single date range and list of categories, if possible.
+
+        :return: Tuple of (lower, upper, categories) where lower and upper may be None, or None if the query has
+                 predicates that are not date ranges or categories to include
+        """
+        lower, upper, categories = None, None, None
+        for predicate in self.predicates:
+            if predicate[0] == 'date':
+                if predicate[1] is not None:
+                    lower = predicate[1] if lower is None else max(lower, predicate[1])
+                if predicate[2] is not None:
+                    upper = predicate[2] if upper is None else min(upper, predicate[2])
+            elif predicate[1] == 'Category' and not predicate[3]:
+                keys = list(dict.fromkeys(predicate[2]))
+                categories = keys if categories is None else [cat for cat in categories if cat in keys]
+            else:
+                return None
+        if categories is None:
+            return None
+        return lower, upper, categories
+
+    def moving_average(self, **kwargs):
+        """
+        Materialize the query and compute moving averages (see Transactions.moving_average)
+
+        :return: Transactions instance
+        """
+        return self.to_transactions().moving_average(**kwargs)
+
+
+def intersect_positions(a, b):
+    """
+    Return the row positions in both a and b, where each is a slice or a sorted ndarray of integer positions.
+
+    :param a: slice or sorted ndarray
+    :param b: slice or sorted ndarray
+    :return: slice if both a and b are slices, otherwise a sorted ndarray
+    """
+    if isinstance(a, slice) and isinstance(b, slice):
+        start = max(a.start, b.start)
+        return slice(start, max(start, min(a.stop, b.stop)))
+    if isinstance(b, slice):
+        a, b = b, a
+    if isinstance(a, slice):
+        return b[np.searchsorted(b, a.start):np.searchsorted(b, a.stop)]
+    return np.intersect1d(a, b, assume_unique=True)
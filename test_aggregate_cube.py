@@ -0,0 +1,86 @@
+import datetime
+import numpy as np
+from unittest import TestCase
+from Transactions import Transactions
+from AggregateCube import AggregateCube
+
+
+class TestAggregateCube(TestCase):
+    def test_interval_totals(self):
+        """
+        Test AggregateCube.interval_totals against slices of the transactions
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        cube = AggregateCube.from_df(trxs.df)
+
+        lowers = [datetime.datetime(2016, 1, 1), datetime.datetime(2017, 2, 10), datetime.datetime(2017, 6, 1),
+                  datetime.datetime(2017, 12, 1)]
+        uppers = [datetime.datetime(2017, 2, 10), datetime.datetime(2017, 5, 31), datetime.datetime(2017, 6, 1),
+                  datetime.datetime(2019, 1, 1)]
+        categories = ['Two Trx', 'Missing', 'One Trx']
+        sums, counts = cube.interval_totals(lowers, uppers, categories)
+        self.assertEqual((4, 3), sums.shape)
+
+        for i in range(len(lowers)):
+            for j, cat in enumerate(categories):
+                expected = trxs.slice_by_date(lowers[i], uppers[i]).slice_by_category([cat])
+                self.assertAlmostEqual(expected.sum(), sums[i, j])
+                self.assertEqual(len(expected), counts[i, j])
+
+        # Empty intervals total 0
+        sums, counts = cube.interval_totals([datetime.datetime(2017, 3, 1)], [datetime.datetime(2017, 2, 1)],
+                                            categories)
+        self.assertTrue(np.all(sums == 0))
+
+    def test_total(self):
+        """
+        Test AggregateCube.total and AggregateCube.daterange
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        cube = trxs.cube()
+
+        self.assertAlmostEqual(trxs.sum(), cube.total(['One Trx', 'Two Trx']))
+        self.assertAlmostEqual(3 + 4 + 5, cube.total(['One Trx'], datetime.datetime(2017, 3, 1),
+                                                     datetime.datetime(2017, 5, 31)))
+        self.assertEqual(0, cube.total(['Missing']))
+
+        self.assertEqual(trxs.get_daterange(), cube.daterange(['One Trx', 'Two Trx']))
+        self.assertEqual((datetime.datetime(2017, 3, 15), datetime.datetime(2017, 5, 15)),
+                         cube.daterange(['One Trx'], datetime.datetime(2017, 3, 1), datetime.datetime(2017, 5, 31)))
+        self.assertIsNone(cube.daterange(['Missing']))
+
+        # The cube is cached until the data changes
+        self.assertIs(cube, trxs.cube())
+        trxs.df = trxs.df.iloc[:3]
+        self.assertIsNot(cube, trxs.cube())
+        self.assertAlmostEqual(trxs.sum(), trxs.cube().total(['One Trx', 'Two Trx']))
+
+    def test_add(self):
+        """
+        Test that adding transactions to a cube, directly or through Transactions.merge, matches rebuilding it
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        lowers = [datetime.datetime(2016, 1, 1), datetime.datetime(2017, 2, 10), datetime.datetime(2017, 12, 1)]
+        uppers = [datetime.datetime(2017, 2, 10), datetime.datetime(2017, 11, 30), datetime.datetime(2019, 1, 1)]
+        categories = ['One Trx', 'Two Trx', 'New Trx']
+
+        for split in [0, 5, 20]:
+            for precompute in [False, True]:
+                merged = Transactions()
+                merged.df = trxs.df.iloc[split:]
+                cube = merged.cube()
+                if precompute:
+                    cube.cumulative()
+
+                # Newer transactions, plus some on dates and in categories the cube has not seen
+                new = Transactions()
+                new.df = trxs.df.iloc[:split + 5].copy()
+                new.df.loc[new.df.index[:3], 'Category'] = 'New Trx'
+                new.df.loc[new.df.index[:2], 'Date'] += datetime.timedelta(days=1)
+                merged.merge(new)
+
+                self.assertIs(cube, merged.cube())
+                expected = AggregateCube.from_df(merged.df).interval_totals(lowers, uppers, categories)
+                actual = cube.interval_totals(lowers, uppers, categories)
+                self.assertTrue(np.allclose(expected[0], actual[0]), msg=f"Failed split={split}")
+                self.assertTrue(np.array_equal(expected[1], actual[1]), msg=f"Failed split={split}")
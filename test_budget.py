@@ -1,7 +1,11 @@
+import datetime
 import numpy as np
+import pandas as pd
 from unittest import TestCase
 from Transactions import Transactions, monthdelta
+from test_transactions import random_transactions
 from Budget import Budget
+import Budget as Budget_module
 
 
 class TestBudget(TestCase):
@@ -48,3 +52,77 @@ class TestBudget(TestCase):
             data = ds.as_matrix()
             self.assertTrue(np.all(np.equal(data, reference[k])), msg=f"Failed test case {k}")
 
+
+    def test_to_ds_random(self):
+        """
+        Test Budget.to_ds against tabulate_transactions for each moving average, for random transactions
+        """
+        trxs = random_transactions(0, 300, ['A', 'B', 'C'], 700, first='2016-01-01')
+        b = Budget(-40, ['A', 'C'], name='AC')
+        moving_average = [1, 2, 4]
+
+        last = trxs.slice_by_category(b.categories).get_daterange()[1]
+        ranges = [(None, None), (datetime.datetime(2016, 5, 17), datetime.datetime(2017, 8, 2)),
+                  (datetime.datetime(2016, 5, 17), None), (None, datetime.datetime(2017, 8, 2)),
+                  (last + datetime.timedelta(days=40), None)]
+        for start, stop in ranges:
+            ds = b.to_ds(trxs, moving_average=moving_average, start=start, stop=stop, return_relative=True)
+            for ma in moving_average:
+                tabulated = b.tabulate_transactions(trxs, moving_average=ma, start=start, stop=stop)
+                self.assertEqual(tabulated.get_dates(), list(ds.xs(ma, level=1).index))
+                np.testing.assert_allclose(np.array(tabulated.get_amounts()) - b.amount, ds.xs(ma, level=1).values)
+
+        self.assertRaises(ValueError, Budget(-1, ['Nothing']).to_ds, trxs)
+
+        # Starting after the last transaction gives the month of start, averaged over earlier months if requested
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        b = Budget(-1, ['One Trx'])
+        ds = b.to_ds(trxs, start=datetime.datetime(2018, 1, 1), return_relative=False)
+        self.assertEqual([(pd.Timestamp(2018, 1, 31), 1)], list(ds.index))
+        self.assertEqual([0.0], list(ds.values))
+        ds = b.to_ds(trxs, moving_average=[3], start=datetime.datetime(2018, 1, 1), return_relative=False)
+        self.assertEqual([(pd.Timestamp(2018, 1, 31), 3)], list(ds.index))
+        self.assertAlmostEqual((11.0 + 12.0) / 3, ds.iloc[0])
+
+    def test_tabulation_cache(self):
+        """
+        Test that tabulate_transactions results are cached, returned as copies and recomputed when the data changes
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        b = Budget(-1, ['One Trx'], name='One')
+        Budget_module.TABULATION_CACHE.clear()
+
+        first = b.tabulate_transactions(trxs, moving_average=3)
+        self.assertEqual(1, len(Budget_module.TABULATION_CACHE))
+        first.df['Amount'] = 0.0
+        second = b.tabulate_transactions(trxs, moving_average=3)
+        self.assertEqual(1, len(Budget_module.TABULATION_CACHE))
+        self.assertNotEqual(0.0, second.df['Amount'].sum())
+
+        # Changing the data gives a new version, so the result is recomputed
+        version = trxs.version
+        trxs.df = trxs.df.drop(trxs.df.index[trxs.df['Category'] == 'One Trx'][:1])
+        self.assertNotEqual(version, trxs.version)
+        third = b.tabulate_transactions(trxs, moving_average=3)
+        self.assertEqual(2, len(Budget_module.TABULATION_CACHE))
+        self.assertNotEqual(second.df['Amount'].sum(), third.df['Amount'].sum())
+
+        # Least recently used results are evicted
+        size = Budget_module.TABULATION_CACHE_SIZE
+        try:
+            Budget_module.TABULATION_CACHE_SIZE = 2
+            b.tabulate_transactions(trxs, moving_average=1)
+            self.assertEqual(2, len(Budget_module.TABULATION_CACHE))
+            self.assertNotIn(('transactions', version, 'One', ('One Trx',), 3, None, None), Budget_module.TABULATION_CACHE)
+        finally:
+            Budget_module.TABULATION_CACHE_SIZE = size
+
+    def test_tabulate_transactions_after_data(self):
+        """
+        Test Budget.tabulate_transactions starting after the last transaction, which gives a single month of $0
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        b = Budget(-3, ['One Trx'], name='One')
+        tabulated = b.tabulate_transactions(trxs, start=datetime.datetime(2018, 1, 1))
+        self.assertEqual([pd.Timestamp(2018, 1, 31)], tabulated.get_dates())
+        self.assertEqual([0.0], tabulated.get_amounts())
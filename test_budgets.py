@@ -2,7 +2,15 @@ from unittest import TestCase
 from Budgets import Budgets
 from Budget import Budget
 from Transactions import Transactions
+from test_transactions import random_transactions
 from pprint import pprint
+import datetime
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import pandas as pd
 import numpy as np
 
 class TestBudgets(TestCase):
@@ -40,6 +48,13 @@ class TestBudgets(TestCase):
         trxs_slice = budgets_none.get_transactions_not_in_budgets(trxs)
         self.assertEqual(len(trxs_slice), 36)
 
+        # Changes to the data are seen without calling invalidate
+        trxs.df.loc[trxs.df.index[trxs.df['Category'] == 'Two Trx'][:5], 'Category'] = 'One Trx'
+        trxs_slice = budgets_one.get_transactions_in_budgets(trxs)
+        self.assertEqual(len(trxs_slice), 17)
+        trxs_slice = budgets_two.get_transactions_in_budgets(trxs)
+        self.assertEqual(len(trxs_slice), 19)
+
     def test_to_df(self):
         """
         MANUAL TEST - NOT REAL
@@ -64,4 +79,117 @@ class TestBudgets(TestCase):
         pprint(df.as_matrix())
         pprint(np.all([reference, df.as_matrix()]))
         print(reference - df.as_matrix())
-        self.assertTrue(np.all(np.equal(reference, df.as_matrix())))
\ No newline at end of file
+        self.assertTrue(np.all(np.equal(reference, df.as_matrix())))
+
+    def test_to_df_random(self):
+        """
+        Test Budgets.to_df against each Budget.to_ds for random transactions, including budgets that share categories
+        """
+        trxs = random_transactions(0, 300, ['A', 'B', 'C', 'D', 'E'], 700, first='2016-01-01')
+        budgets = Budgets()
+        budgets.add_budget(Budget(-50, ['A', 'B'], name='AB'))
+        budgets.add_budget(Budget(-20, ['C'], name='C'))
+        budgets.add_budget(Budget(-10, ['Nothing'], name='Nothing'))
+        budgets.add_budget(Budget(-30, ['B', 'D'], name='BD'), ignore_duplicates=True)
+
+        start = datetime.datetime(2016, 5, 17)
+        stop = datetime.datetime(2017, 8, 2)
+        for return_relative in [True, False]:
+            df = budgets.to_df(trxs, moving_average=[1, 3, 6], start=start, stop=stop, return_relative=return_relative)
+            self.assertEqual((4, 16 * 3), df.shape)
+            for b in budgets.get_budgets():
+                ds = b.to_ds(trxs, moving_average=[1, 3, 6], start=start, stop=stop, return_relative=return_relative)
+                pd.testing.assert_series_equal(ds, df.loc[ds.name])
+
+    def test_to_df_dense(self):
+        """
+        Test that Budgets.to_df covers the whole range for every budget, with 0 for months without transactions
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        budgets = Budgets()
+        budgets.add_budget(Budget(-1, ['One Trx'], name='One Trx Budget'))
+        budgets.add_budget(Budget(-5, ['Nothing'], name='Nothing Budget'))
+
+        start = datetime.datetime(2016, 7, 5)
+        stop = datetime.datetime(2018, 4, 2)
+        df = budgets.to_df(trxs, moving_average=[1, 3], start=start, stop=stop, return_relative=False)
+        self.assertEqual((2, 22 * 2), df.shape)
+        self.assertFalse(df.isnull().values.any())
+        self.assertTrue(np.all(df.loc['Nothing Budget (-5)'].values == 0.0))
+        self.assertEqual(0.0, df.iloc[0][(pd.Timestamp(2016, 7, 31), 1)])
+
+        self.assertEqual(0, len(Budgets().to_df(trxs, start=start, stop=stop)))
+
+    def test_add_budget(self):
+        """
+        Test Budgets.add_budget, including detection of categories already in a budget
+        """
+        budgets = Budgets()
+        budgets.add_budget(Budget(-1, ['A', 'B'], name='AB'))
+        budgets.add_budget(Budget(-1, ['C'], name='C'))
+        with self.assertRaisesRegex(ValueError, "'B'"):
+            budgets.add_budget(Budget(-1, ['D', 'B'], name='DB'))
+        self.assertEqual(2, len(budgets.get_budgets()))
+
+        budgets.add_budget(Budget(-1, ['D', 'B'], name='DB'), ignore_duplicates=True)
+        self.assertEqual({'A': [0], 'B': [0, 2], 'C': [1], 'D': [2]}, budgets.category_budgets)
+        self.assertEqual(['A', 'B', 'C', 'D'], sorted(budgets.get_categories(remove_duplicates=True)))
+        self.assertEqual(['A', 'B', 'C', 'D', 'B'], budgets.get_categories())
+
+    def test_plot(self):
+        """
+        Test that Budgets.plot saves a PNG for each budget, serially and in a process pool, and closes its figures
+        """
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        budgets = Budgets()
+        budgets.add_budget(Budget(-1, ['One Trx'], name='One Trx Budget'))
+        budgets.add_budget(Budget(-2, ['Two Trx'], name='Two Trx Budget'))
+
+        for workers in [1, 2]:
+            saveloc = tempfile.mkdtemp()
+            try:
+                budgets.plot(trxs, moving_average=[3], saveloc=saveloc + '/', workers=workers)
+                self.assertEqual(['One Trx Budget.png', 'Two Trx Budget.png'], sorted(os.listdir(saveloc)))
+                self.assertEqual([], plt.get_fignums())
+            finally:
+                shutil.rmtree(saveloc)
+
+    def test_heatmap_table(self):
+        """
+        Test Budgets.heatmap_table from a precomputed DataFrame, split into pages, and Budgets.percent_of_budget
+        """
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        budgets = Budgets()
+        budgets.add_budget(Budget(-4, ['One Trx'], name='One Trx Budget'))
+        budgets.add_budget(Budget(0, ['Two Trx'], name='Two Trx Budget'))
+        df = budgets.to_df(trxs, moving_average=[1, 3])
+
+        np.testing.assert_allclose(df.values[0] * 25.0, budgets.percent_of_budget(df)[0])
+        self.assertTrue(np.all(budgets.percent_of_budget(df)[1] == 0.0))
+
+        saveloc = tempfile.mkdtemp()
+        try:
+            budgets.heatmap_table(trxs, df=df, saveloc=os.path.join(saveloc, 'budget'), relative_scale=True,
+                                  months_per_page=5)
+            self.assertEqual(['budget_1.png', 'budget_2.png', 'budget_3.png'], sorted(os.listdir(saveloc)))
+            budgets.heatmap_table(trxs, moving_average=[1, 3], saveloc=os.path.join(saveloc, 'single'))
+            self.assertTrue(os.path.exists(os.path.join(saveloc, 'single.png')))
+            self.assertEqual([], plt.get_fignums())
+        finally:
+            shutil.rmtree(saveloc)
+
+    def test_import_without_plotting(self):
+        """
+        Test that importing Budgets does not load matplotlib or seaborn until something is plotted
+        """
+        code = "import sys, Budgets; print(sorted(m for m in ('matplotlib', 'seaborn') if m in sys.modules))"
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual('[]', output.decode().strip())
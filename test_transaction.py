@@ -208,4 +208,19 @@ class TestTransaction(TestCase):
 
         trx = Transaction.from_csv(",".join(some_data))
         some_data_new = trx.to_list()
-        self.assertEqual(some_data_ref, some_data_new)
\ No newline at end of file
+        self.assertEqual(some_data_ref, some_data_new)
+
+    def test_slots(self):
+        """
+        Test that Transaction stores its fields in slots rather than a per-instance dict
+        """
+        trx = Transaction.sample_trx()
+        self.assertFalse(hasattr(trx, '__dict__'))
+        self.assertEqual(Transaction.FIELDS, trx.fields)
+        with self.assertRaises(AttributeError):
+            trx.Date = datetime.datetime(2017, 12, 11)
+
+        trx.category = 'Rent'
+        trx.amount = '12.345'
+        self.assertEqual('Rent', trx.category)
+        self.assertEqual(12.35, trx.amount)
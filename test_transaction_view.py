@@ -0,0 +1,47 @@
+from unittest import TestCase
+from Transaction import Transaction
+from TransactionView import TransactionView
+from Transactions import Transactions
+
+
+class TestTransactionView(TestCase):
+    def test_fields(self):
+        """
+        Test that TransactionView reads each field from its row of a Transactions DataFrame
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        for compact in [False, True]:
+            if compact:
+                trxs.compact()
+            views = list(trxs.iter_transactions())
+            self.assertEqual(len(trxs), len(views))
+            for view, (_, row) in zip(views, trxs.df.iterrows()):
+                self.assertIsInstance(view, Transaction)
+                self.assertEqual(row['Date'], view.date)
+                self.assertEqual(row['Original Description'], view.description_original)
+                self.assertEqual(row['Account Name'], view.account)
+                self.assertEqual(row['Category'], view.category)
+                self.assertEqual(abs(row['Amount']), view.amount)
+                self.assertEqual(row['Amount'], view.signed_amount)
+                self.assertIsNone(view.notes)
+
+        with self.assertRaises(AttributeError):
+            views[0].category = 'Rent'
+
+    def test_round_trip(self):
+        """
+        Test that Transactions.from_transactions rebuilds the same Transactions from views or Transaction instances
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        rebuilt = Transactions.from_transactions(trxs.iter_transactions())
+        self.assertTrue(trxs.df.equals(rebuilt.df))
+
+        records = [Transaction.sample_trx(transaction_type=t) for t in ['debit', 'credit', 'debit']]
+        rebuilt = Transactions.from_transactions(records)
+        self.assertEqual(3, len(rebuilt))
+        for record, view in zip(records, rebuilt.iter_transactions()):
+            self.assertEqual(record, view)
+            self.assertEqual(record.signed_amount, view.signed_amount)
+            self.assertEqual(record.to_csv(), view.to_csv())
+
+        self.assertEqual(0, len(Transactions.from_transactions([])))
@@ -1,7 +1,14 @@
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import warnings
 import numpy as np
+import pandas as pd
 import datetime
 from unittest import TestCase
-from Transactions import Transactions
+from Transactions import Transactions, monthdelta, month_intervals, period_shift, period_end
 
 class TestTransactions2(TestCase):
     def test_from_csv(self):
@@ -15,6 +22,169 @@ class TestTransactions2(TestCase):
         self.assertAlmostEqual(trxs.df.iloc[2]['Account Name'], 'Ac')
         self.assertAlmostEqual(trxs.df.iloc[3]['Category'], 'Two Trx')
 
+        # All rows with an invalid Transaction Type are reported at once
+        bad_csv = io.StringIO(
+            '"Date","Description","Original Description","Amount","Transaction Type","Category","Account Name","Labels","Notes"\n'
+            '"12/28/2017","D","OD","12","debit","Two Trx","Ac","",""\n'
+            '"12/15/2017","D","OD","12","refund","One Trx","Ac","",""\n'
+            '"12/10/2017","D","OD","12","credit","Two Trx","Ac","",""\n'
+            '"11/28/2017","D","OD","11","Debit","Two Trx","Ac","",""\n'
+        )
+        with self.assertRaises(ValueError) as cm:
+            Transactions.from_csv(bad_csv)
+        self.assertIn("2 row(s)", str(cm.exception))
+        self.assertIn("'refund'", str(cm.exception))
+        self.assertIn("'Debit'", str(cm.exception))
+
+    def test_iter_csv(self):
+        """
+        Test Transactions.iter_csv and chunked reading in Transactions.from_csv
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+
+        chunks = list(Transactions.iter_csv('sample_transactions_1.csv', chunksize=10))
+        self.assertEqual([10, 10, 10, 6], [len(chunk) for chunk in chunks])
+        self.assertTrue(trxs.df.iloc[10:20].equals(chunks[1].df))
+
+        # Chunks are normal Transactions instances
+        self.assertAlmostEqual(trxs.sum(), sum(chunk.sum() for chunk in chunks))
+        self.assertEqual(7, len(chunks[0].by_month()))
+
+        # Accumulated chunks match a single-pass read
+        self.assertTrue(trxs.df.equals(Transactions.from_csv('sample_transactions_1.csv', chunksize=7).df))
+
+    def test_from_csv_cache(self):
+        """
+        Test the cache option of Transactions.from_csv
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            csv_file = os.path.join(tmpdir, 'trxs.csv')
+            shutil.copy('sample_transactions_1.csv', csv_file)
+            cache_file = csv_file + Transactions.CACHE_SUFFIX
+
+            # First read builds the cache, second read loads from it
+            self.assertTrue(trxs.df.equals(Transactions.from_csv(csv_file, cache=True).df))
+            self.assertTrue(os.path.exists(cache_file))
+            mtime = os.path.getmtime(cache_file)
+            self.assertTrue(trxs.df.equals(Transactions.from_csv(csv_file, cache=True).df))
+            self.assertEqual(mtime, os.path.getmtime(cache_file))
+
+            # Changing the csv rebuilds the cache
+            with open(csv_file, 'a') as f:
+                f.write('\n"01/02/2018","D","OD","5","debit","New","Ac","",""')
+            trxs_new = Transactions.from_csv(csv_file, cache=True)
+            self.assertEqual(37, len(trxs_new))
+            self.assertEqual(37, len(Transactions.from_csv(csv_file, cache=True)))
+
+            # A cache with the right key but a payload that cannot be loaded is rebuilt
+            with open(cache_file, 'rb') as f:
+                key = pickle.load(f)
+            with open(cache_file, 'wb') as f:
+                pickle.dump(key, f)
+                f.write(b'cmodule_that_does_not_exist\nDataFrame\n.')
+            self.assertEqual(37, len(Transactions.from_csv(csv_file, cache=True)))
+            self.assertEqual(37, len(Transactions.from_csv(csv_file, cache=True)))
+
+            # A cache that cannot be written is skipped
+            os.remove(cache_file)
+            os.mkdir(cache_file)
+            self.assertEqual(37, len(Transactions.from_csv(csv_file, cache=True)))
+            self.assertEqual([], [name for name in os.listdir(tmpdir) if name.endswith('.tmp')])
+
+        self.assertRaises(ValueError, Transactions.from_csv, io.StringIO(''), cache=True)
+
+    def test_compact(self):
+        """
+        Test compact (categorical) storage of Transactions
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        compact = Transactions.from_csv('sample_transactions_1.csv', compact=True)
+
+        for col in Transactions.COMPACT_COLUMNS:
+            self.assertEqual('category', compact.df[col].dtype.name)
+            self.assertLess(compact.df[col].memory_usage(deep=True), trxs.df[col].memory_usage(deep=True) / 4)
+        self.assertEqual(list(trxs.df['Category']), list(compact.df['Category']))
+
+        # Compact storage carries through slices and summaries with the same values
+        self.assertEqual('category', compact.slice_by_category(['Two Trx']).df['Category'].dtype.name)
+        self.assertTrue(trxs.slice_by_category(['Two Trx']).df['Amount'].equals(
+            compact.slice_by_category(['Two Trx']).df['Amount']))
+        self.assertEqual(0, len(compact.slice_by_category(['Not A Category'])))
+        summarized = compact.by_month(ignore_blanks=False)
+        self.assertEqual('category', summarized.df['Category'].dtype.name)
+        self.assertTrue(trxs.by_month(ignore_blanks=False).df['Amount'].equals(summarized.df['Amount']))
+
+        # Chunks with different categories are combined without losing compactness
+        chunked = Transactions.from_csv('sample_transactions_1.csv', chunksize=3, compact=True)
+        self.assertEqual('category', chunked.df['Category'].dtype.name)
+        self.assertEqual(list(trxs.df['Category']), list(chunked.df['Category']))
+
+        trxs.compact()
+        self.assertEqual('category', trxs.df['Account Name'].dtype.name)
+
+    def test_from_csvs(self):
+        """
+        Test Transactions.from_csvs by splitting the sample file into several files and reading them back in
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Split out of date order (each file holds every third transaction)
+            csv_files = []
+            for i in range(3):
+                csv_file = os.path.join(tmpdir, f"part_{i}.csv")
+                Transactions.read_csv('sample_transactions_1.csv').iloc[i::3].to_csv(csv_file, index=False,
+                                                                                     date_format='%m/%d/%Y')
+                csv_files.append(csv_file)
+
+            for workers in [1, 2]:
+                merged = Transactions.from_csvs(csv_files, workers=workers)
+                self.assertTrue(trxs.df.equals(merged.df), msg=f"Failed with workers={workers}")
+
+            # Duplicate dates keep the order of the files
+            merged = Transactions.from_csvs(csv_files[:2] + csv_files[:1], workers=2)
+            self.assertEqual(36 // 3 * 3, len(merged))
+            self.assertTrue(merged.df['Date'].is_monotonic_decreasing)
+            self.assertTrue(merged.df.iloc[0].equals(merged.df.iloc[1]))
+
+        self.assertRaises(ValueError, Transactions.from_csvs, [])
+
+    def test_merge(self):
+        """
+        Test Transactions.merge and Transactions.append_csv with overlapping exports
+        """
+        raw = Transactions.read_csv('sample_transactions_1.csv')
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Older export covers the oldest 20 transactions, newer covers the most recent 26 (10 overlap)
+            old_csv = os.path.join(tmpdir, 'old.csv')
+            new_csv = os.path.join(tmpdir, 'new.csv')
+            raw.iloc[16:].to_csv(old_csv, index=False, date_format='%m/%d/%Y')
+            raw.iloc[:26].to_csv(new_csv, index=False, date_format='%m/%d/%Y')
+
+            merged = Transactions.from_csv(old_csv)
+            added = merged.append_csv(new_csv)
+            self.assertEqual(16, len(added))
+            self.assertTrue(trxs.df.equals(merged.df))
+
+            # Merging again adds nothing
+            added = merged.append_csv(new_csv)
+            self.assertEqual(0, len(added))
+            self.assertEqual(36, len(merged))
+
+        # Repeated transactions are only added for repeats beyond those already present
+        twice = Transactions()
+        twice.df = pd.concat([trxs.df.iloc[:2], trxs.df.iloc[:1]], ignore_index=True)
+        merged = Transactions()
+        merged.df = trxs.df.iloc[:1]
+        added = merged.merge(twice)
+        self.assertEqual(2, len(added))
+        self.assertEqual(3, len(merged))
+        self.assertEqual(2, len(merged.slice_by_date(start=datetime.datetime(2017, 12, 28))))
+
     def test_slice_by_categories(self):
         """
             Test Transactions.slice_by_category by slicing a sample Transactions object
@@ -36,6 +206,34 @@ class TestTransactions2(TestCase):
         self.assertEqual(len(trxs_2), 12)
         self.assertEqual(trxs_2.df.iloc[6].Amount, 6.0)
 
+    def test_positions_by_keys(self):
+        """
+        Test Transactions.positions_by_keys against a brute force mask, including invalidation of the index
+        """
+        for compact in [False, True]:
+            trxs = Transactions.from_csv('sample_transactions_1.csv', compact=compact)
+            trxs.df = trxs.df.sample(frac=1, random_state=0)
+            key_lists = [[], ['One Trx'], ['Two Trx', 'One Trx'], ['Two Trx', 'Two Trx'], ['Missing'],
+                         ['Missing', 'One Trx']]
+            for keys in key_lists:
+                rows = trxs.df['Category'].isin(keys).values
+                self.assertTrue(np.array_equal(np.flatnonzero(rows), trxs.positions_by_keys('Category', keys)))
+                self.assertTrue(np.array_equal(np.flatnonzero(~rows),
+                                               trxs.positions_by_keys('Category', keys, return_anti_match=True)))
+
+            # Missing values are never matched
+            self.assertEqual(0, len(trxs.positions_by_keys('Labels', [np.nan])))
+            self.assertEqual(36, len(trxs.positions_by_keys('Labels', [np.nan], return_anti_match=True)))
+
+            # Index is rebuilt when the data changes
+            trxs.df = trxs.df.iloc[:10]
+            self.assertEqual(10, len(trxs.positions_by_keys('Category', ['One Trx', 'Two Trx'])))
+
+            # ... including when it is changed in place
+            trxs.df.loc[trxs.df.index[:5], 'Category'] = 'One Trx'
+            rows = trxs.df['Category'].isin(['One Trx']).values
+            self.assertTrue(np.array_equal(np.flatnonzero(rows), trxs.positions_by_keys('Category', ['One Trx'])))
+
     def test_slice_by_date(self):
         """
         Test the Transactions.slice_by_date
@@ -107,6 +305,38 @@ class TestTransactions2(TestCase):
             # Do some spot checks...
             self.assertEqual(datetime.datetime(2017, 11, 28), sliced.df.iloc[3].Date)
 
+    def test_positions_by_date(self):
+        """
+        Test Transactions.positions_by_date against a brute force mask, with rows in different orders
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        orders = {
+            'descending': trxs.df,
+            'ascending': trxs.df.iloc[::-1],
+            'shuffled': trxs.df.sample(frac=1, random_state=42),
+        }
+        bounds = [None, datetime.datetime(2016, 1, 1), datetime.datetime(2017, 2, 10), datetime.datetime(2017, 6, 1),
+                  datetime.datetime(2017, 11, 28), datetime.datetime(2019, 1, 1)]
+
+        for name, df in orders.items():
+            ordered = Transactions()
+            ordered.df = df
+            for start in bounds:
+                for stop in bounds:
+                    if start is not None and stop is not None and start > stop:
+                        continue
+                    rows = np.ones(len(df), dtype=bool)
+                    if start is not None:
+                        rows &= (df['Date'] >= start).values
+                    if stop is not None:
+                        rows &= (df['Date'] <= stop).values
+                    positions = ordered.positions_by_date(start, stop)
+                    if name != 'shuffled':
+                        self.assertIsInstance(positions, slice)
+                    self.assertTrue(np.array_equal(np.flatnonzero(rows), np.arange(len(df))[positions]),
+                                    msg=f"Failed {name} with start:{start} stop:{stop}")
+                    self.assertTrue(df.loc[rows].equals(ordered.slice_by_date(start, stop).df))
+
     def test_sum(self):
         """
         Test Transactions.sum()
@@ -225,6 +455,126 @@ class TestTransactions2(TestCase):
         self.assertTrue(np.all([res, summarized.slice_by_category(['All Trx']).df.Amount.as_matrix()]))
 
 
+    def test_by_month_random(self):
+        """
+        Test Transactions.by_month against per-month, per-category slices of a larger random set of transactions
+        """
+        trxs = random_transactions(0, 500, ['A', 'B', 'C', 'D'], 1000)
+        start = datetime.datetime(2015, 3, 12)
+        stop = datetime.datetime(2017, 4, 3)
+
+        summarized = trxs.by_month(start=start, stop=stop, ignore_blanks=False)
+        self.assertEqual(4 * 26, len(summarized))
+        for _, row in summarized.df.iterrows():
+            month_start = max(start, row['Date'].replace(day=1))
+            expected = trxs.slice_by_date(month_start, row['Date']).slice_by_category([row['Category']]).sum()
+            self.assertAlmostEqual(expected, row['Amount'], msg=f"Failed on {row['Date']} {row['Category']}")
+
+    def test_moving_average_random(self):
+        """
+        Test Transactions.moving_average against slices of each window, using transactions with a time of day
+        """
+        trxs = random_transactions(1, 500, ['A', 'B', 'C'], 1000 * 24, unit='h')
+        start = datetime.datetime(2015, 6, 12, 6)
+        stop = datetime.datetime(2017, 4, 3)
+
+        for n in [1, 2, 5]:
+            summarized = trxs.moving_average(start=start, stop=stop, n=n)
+            self.assertEqual(3 * 23, len(summarized))
+            for _, row in summarized.df.iterrows():
+                window_start = monthdelta(row['Date'], -(n - 1), day=1)
+                expected = trxs.slice_by_date(window_start, row['Date']).slice_by_category([row['Category']]).sum()
+                self.assertAlmostEqual(expected / n, row['Amount'], msg=f"Failed n={n} on {row['Date']}")
+
+    def test_by_month_empty(self):
+        """
+        Test Transactions.by_month with a start but no transactions to take the end of the range from
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        start = datetime.datetime(2018, 1, 1)
+
+        summarized = trxs.slice_by_category(['Nope']).by_month(start=start)
+        self.assertEqual(0, len(summarized))
+
+        summarized = trxs.slice_by_date(start=start).slice_by_category(['One Trx']).by_month(start=start,
+                                                                                             combine_as='One')
+        self.assertEqual([pd.Timestamp(2018, 1, 31)], summarized.get_dates())
+        self.assertEqual([0.0], summarized.get_amounts())
+
+    def test_in_place_changes(self):
+        """
+        Test that results cached from df are recomputed after df is modified in place, without calling invalidate
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        self.assertAlmostEqual(-78.0, trxs.by_month(combine_as='All Trx').df['Amount'].sum())
+        version = trxs.version
+        self.assertEqual(version, trxs.version)
+
+        trxs.df['Amount'] = trxs.df['Amount'] * 2
+        self.assertNotEqual(version, trxs.version)
+        self.assertAlmostEqual(-156.0, trxs.by_month(combine_as='All Trx').df['Amount'].sum())
+
+        version = trxs.version
+        trxs.df.loc[trxs.df.index[trxs.df['Category'] == 'Two Trx'][:5], 'Category'] = 'One Trx'
+        self.assertNotEqual(version, trxs.version)
+        fresh = Transactions()
+        fresh.df = trxs.df.copy()
+        self.assertTrue(fresh.by_month().df.equals(trxs.by_month().df))
+        self.assertTrue(fresh.by_month(start=datetime.datetime(2017, 3, 1)).df.equals(
+            trxs.by_month(start=datetime.datetime(2017, 3, 1)).df))
+
+    def test_by_period_random(self):
+        """
+        Test Transactions.by_period and moving_average by days, weeks, quarters and years against slices of each period
+        """
+        trxs = random_transactions(2, 300, ['A', 'B'], 1200)
+        start = datetime.datetime(2015, 5, 14)
+        stop = datetime.datetime(2017, 11, 3)
+
+        for by in ['days', 'weeks', 'quarters', 'years']:
+            summarized = trxs.by_period(by=by, start=start, stop=stop, ignore_blanks=False)
+            dates = summarized.df['Date']
+            self.assertGreaterEqual(dates.max(), stop, msg=f"Failed on {by}")
+            self.assertEqual(period_end(dates.iloc[-1], by), dates.iloc[-1], msg=f"Failed on {by}")
+            if by != 'days':
+                for _, row in summarized.df.sample(n=min(20, len(summarized)), random_state=0).iterrows():
+                    period_start = max(start, period_shift(row['Date'], 0, by))
+                    expected = trxs.slice_by_date(period_start, row['Date']).slice_by_category([row['Category']]).sum()
+                    self.assertAlmostEqual(expected, row['Amount'], msg=f"Failed on {by} {row['Date']}")
+
+            summarized = trxs.moving_average(by=by, n=2, start=start, stop=stop)
+            self.assertEqual(f"2-{by[:-1]} Average", summarized.df['Description'].iloc[0])
+            for _, row in summarized.df.sample(n=min(20, len(summarized)), random_state=0).iterrows():
+                window_start = period_shift(row['Date'], -1, by)
+                expected = trxs.slice_by_date(window_start, row['Date']).slice_by_category([row['Category']]).sum()
+                self.assertAlmostEqual(expected / 2, row['Amount'], msg=f"Failed on {by} {row['Date']}")
+
+        self.assertEqual(pd.Timestamp(2017, 11, 6), period_shift(datetime.datetime(2017, 11, 9), 0, 'weeks'))
+        self.assertEqual(pd.Timestamp(2017, 12, 31), period_end(datetime.datetime(2017, 11, 9), 'quarters'))
+        self.assertRaises(NotImplementedError, trxs.moving_average, by='decades')
+
+    def test_month_intervals(self):
+        """
+        Test the array based month_intervals against building the intervals one month at a time
+        """
+        rng = np.random.RandomState(3)
+        for _ in range(50):
+            start = datetime.datetime(2016, 1, 1) + datetime.timedelta(hours=int(rng.randint(0, 800 * 24)))
+            stop = start + datetime.timedelta(hours=int(rng.randint(0, 800 * 24)))
+            for n in [1, 3]:
+                expected = [(start, monthdelta(start, n - 1))]
+                while expected[-1][-1] < stop:
+                    next_start = monthdelta(expected[-1][0], 1, day=1)
+                    expected.append((next_start, monthdelta(next_start, n - 1)))
+                self.assertEqual(expected, month_intervals(start, stop, n_months=n), msg=f"Failed on {start} {stop}")
+
+        # Without a stop (eg: the latest date of no transactions), only the first interval is returned
+        start = datetime.datetime(2017, 3, 5, 6)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            self.assertEqual([(start, monthdelta(start, 2))], month_intervals(start, pd.NaT, n_months=3))
+        self.assertRaises(ValueError, month_intervals, pd.NaT, start)
+
     def test_moving_average(self):
         """
         Test Transactions.summarize_transaction
@@ -326,3 +676,25 @@ class TestTransactions2(TestCase):
         # Same as above...
         # self.assertTrue(np.all([res, summarized.slice_by_category(['Two Trx']).df.Amount.as_matrix()]))
         self.assertAlmostEqual(res.sum(), summarized.slice_by_category(['Two Trx']).df.Amount.as_matrix().sum())
+
+
+def random_transactions(seed, n, categories, span, unit='D', first='2015-01-01'):
+    """
+    Return a Transactions of n random transactions, for tests that compare results against slices of the data
+
+    :param seed: Seed for the random number generator
+    :param n: Number of transactions
+    :param categories: List of categories to choose from
+    :param span: Length of the date range, in units of unit
+    :param unit: Unit of span (eg: 'D' for days, 'h' for hours)
+    :param first: Date of the start of the range
+    :return: Transactions instance with Date, Amount and Category columns
+    """
+    rng = np.random.RandomState(seed)
+    trxs = Transactions()
+    trxs.df = pd.DataFrame({
+        'Date': pd.to_datetime(first) + pd.to_timedelta(rng.randint(0, span, n), unit=unit),
+        'Amount': rng.randint(-100, 100, n).astype(float),
+        'Category': rng.choice(categories, n),
+    })
+    return trxs
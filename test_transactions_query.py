@@ -0,0 +1,71 @@
+import datetime
+import numpy as np
+from unittest import TestCase
+from Transactions import Transactions
+from TransactionsQuery import intersect_positions
+
+
+class TestTransactionsQuery(TestCase):
+    def test_to_transactions(self):
+        """
+        Test that chained lazy slices match the same chain of eager slices
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        start = datetime.datetime(2017, 2, 10)
+        stop = datetime.datetime(2017, 11, 28)
+
+        eager = trxs.slice_by_date(start, stop).slice_by_category(['Two Trx'])
+        lazy = trxs.query().slice_by_date(start, stop).slice_by_category(['Two Trx'])
+        self.assertTrue(eager.df.equals(lazy.to_transactions().df))
+        self.assertEqual(len(eager), len(lazy))
+        self.assertAlmostEqual(eager.sum(), lazy.sum())
+        self.assertTrue(eager.by_month().df.equals(lazy.by_month().df))
+
+        # Order of predicates does not matter, and repeated predicates narrow the result
+        lazy = trxs.query().slice_by_category(['One Trx'], return_anti_match=True).slice_by_date(start, stop)
+        self.assertTrue(eager.df.equals(lazy.df))
+        lazy = lazy.slice_by_date(stop=datetime.datetime(2017, 6, 30)).slice_by_keys('Account Name', ['Ac'])
+        self.assertTrue(eager.slice_by_date(stop=datetime.datetime(2017, 6, 30)).df.equals(lazy.df))
+
+        # Predicates are only recorded, so a query can be branched
+        base = trxs.query().slice_by_date(start=start)
+        self.assertEqual(len(trxs.slice_by_date(start=start)), len(base))
+        self.assertEqual(0, len(base.slice_by_category(['Missing'])))
+
+        self.assertRaises(ValueError, trxs.query().slice_by_date, stop, start)
+        self.assertRaises(ValueError, trxs.query().slice_by_category, 'One Trx')
+
+    def test_by_month(self):
+        """
+        Test that combined monthly summaries answered from the aggregate cube match summaries of eager slices
+        """
+        trxs = Transactions.from_csv('sample_transactions_1.csv')
+        dates = [None, datetime.datetime(2016, 7, 5), datetime.datetime(2017, 3, 5), datetime.datetime(2017, 9, 2),
+                 datetime.datetime(2018, 4, 2)]
+        for lower in dates:
+            for upper in dates:
+                if lower is not None and upper is not None and lower > upper:
+                    continue
+                for categories in [['One Trx'], ['One Trx', 'Two Trx']]:
+                    eager = trxs.slice_by_date(lower, upper).slice_by_category(categories)
+                    lazy = trxs.query().slice_by_date(lower, upper).slice_by_category(categories)
+                    for start, stop in [(None, None), (lower, upper)]:
+                        if len(eager) == 0 and start is None:
+                            # No transactions to take the start of the range from
+                            continue
+                        expected = eager.by_month(combine_as='Combined', start=start, stop=stop)
+                        self.assertTrue(expected.df.equals(lazy.by_month(combine_as='Combined', start=start,
+                                                                         stop=stop).df),
+                                        msg=f"Failed on {lower} to {upper} with {categories}")
+
+    def test_intersect_positions(self):
+        """
+        Test intersect_positions with each combination of slices and arrays
+        """
+        a = np.array([1, 3, 5, 7, 9])
+        b = np.array([3, 4, 5, 10])
+        self.assertEqual(slice(3, 5), intersect_positions(slice(0, 5), slice(3, 8)))
+        self.assertEqual(slice(6, 6), intersect_positions(slice(0, 5), slice(6, 8)))
+        self.assertTrue(np.array_equal([3, 5], intersect_positions(slice(2, 6), a)))
+        self.assertTrue(np.array_equal([3, 5], intersect_positions(a, slice(2, 6))))
+        self.assertTrue(np.array_equal([3, 5], intersect_positions(a, b)))